@@ -1,19 +1,24 @@
 import os
-import csv
 import subprocess
 import shutil
-import requests
+import time
 from dotenv import load_dotenv
+import metrics
+from report_sink import ReportWriter, report_path
+from scan_cache import cached_scan
 
 # Load GitHub token from .env
 load_dotenv()
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 HEADERS = {"Authorization": f"token {GITHUB_TOKEN}"}
-BASE_URL = "https://api.github.com"
+BASE_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
 
 # Constants
 SIZE_THRESHOLD_BYTES = 1 * 1024 * 1024  # 1MB for debug
 OUTPUT_CSV = "binary_over_1mb_report.csv"
+REPORT_FIELDS = ["org", "repo_url", "has_binary_over_1mb"]
+# Bump when the scan logic changes so cached results are not reused
+CHECK_VERSION = f"1:{SIZE_THRESHOLD_BYTES}"
 
 # TEMP: Treat all files as binary to verify detection
 def is_binary_file(filename):
@@ -23,7 +28,7 @@ def get_all_orgs():
     orgs = []
     page = 1
     while True:
-        res = requests.get(f"{BASE_URL}/user/orgs?per_page=100&page={page}", headers=HEADERS)
+        res = metrics.http_get(f"{BASE_URL}/user/orgs?per_page=100&page={page}", headers=HEADERS)
         if res.status_code != 200:
             print("Failed to fetch orgs:", res.text)
             break
@@ -39,7 +44,7 @@ def get_all_repos(org_name):
     repos = []
     page = 1
     while True:
-        res = requests.get(f"{BASE_URL}/orgs/{org_name}/repos?per_page=100&page={page}", headers=HEADERS)
+        res = metrics.http_get(f"{BASE_URL}/orgs/{org_name}/repos?per_page=100&page={page}", headers=HEADERS)
         if res.status_code != 200:
             print(f"Failed to fetch repos for {org_name}: {res.text}")
             break
@@ -53,9 +58,12 @@ def get_all_repos(org_name):
     return repos
 
 def check_binary_files_over_threshold(repo_path):
+    start = time.perf_counter()
+    files_seen = 0
     try:
         for root, _, files in os.walk(repo_path):
             for file in files:
+                files_seen += 1
                 file_path = os.path.join(root, file)
                 if is_binary_file(file_path):
                     size = os.path.getsize(file_path)
@@ -64,6 +72,8 @@ def check_binary_files_over_threshold(repo_path):
                         return True
     except Exception as e:
         print(f"Error scanning {repo_path}: {e}")
+    finally:
+        metrics.record_scan(files_seen, time.perf_counter() - start, check="binary")
     return False
 
 def clone_and_check(repo_url):
@@ -72,38 +82,46 @@ def clone_and_check(repo_url):
         shutil.rmtree(repo_name)
     try:
         print(f"Cloning {repo_url}")
+        start = time.perf_counter()
         subprocess.run(["git", "clone", "--depth", "1", repo_url], check=True)
+        metrics.record_clone(repo_name, time.perf_counter() - start, check="binary", repo=repo_url)
         has_large_binary = check_binary_files_over_threshold(repo_name)
         shutil.rmtree(repo_name)
         return has_large_binary
     except subprocess.CalledProcessError as e:
+        metrics.incr("clone.failed", check="binary")
         print(f"Clone failed for {repo_url}: {e}")
     except Exception as e:
         print(f"Unexpected error for {repo_url}: {e}")
-    return False
+    return None
 
-def main():
-    orgs = get_all_orgs()
-    results = []
+def iter_tasks():
+    """Every (org, repo_url) to check; also used to fill the shared work queue."""
+    for org in get_all_orgs():
+        for repo_url in get_all_repos(org):
+            yield {"org": org, "repo_url": repo_url}
 
-    for org in orgs:
-        repos = get_all_repos(org)
-        for repo_url in repos:
-            print(f"Checking repo: {repo_url}")
-            has_large_binary = clone_and_check(repo_url)
-            results.append({
-                "org": org,
-                "repo_url": repo_url,
-                "has_binary_over_1mb": has_large_binary
-            })
+def check_repo(org, repo_url):
+    print(f"Checking repo: {repo_url}")
+    with metrics.stage("repo_total", check="binary", repo=repo_url):
+        # None means the clone failed: reported as False, but never cached
+        has_large_binary = bool(cached_scan(
+            repo_url, "binary", CHECK_VERSION, lambda: clone_and_check(repo_url)
+        ))
+    return {
+        "org": org,
+        "repo_url": repo_url,
+        "has_binary_over_1mb": has_large_binary
+    }
+
+def main():
+    output = report_path(OUTPUT_CSV)
 
-    with open(OUTPUT_CSV, mode='w', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=["org", "repo_url", "has_binary_over_1mb"])
-        writer.writeheader()
-        for row in results:
-            writer.writerow(row)
+    with ReportWriter(output, REPORT_FIELDS) as report:
+        for task in iter_tasks():
+            report.write(check_repo(**task))
 
-    print(f"\nCSV written to: {OUTPUT_CSV}")
+    print(f"\nReport written to: {output}")
 
 if __name__ == "__main__":
-    main()
+    metrics.run_main(main)
@@ -0,0 +1,182 @@
+"""
+Benchmark harness: runs the scripts against the local GHES stub and records throughput.
+
+Each run starts ghes_stub.py in-process on a free port, gives every script its own
+scratch directory (with the input CSV it expects) and an environment pointing at the
+stub, and times the script end to end. Results are appended to --history as JSON
+lines and compared with the previous runs of the same script on the same fixture
+and stub settings.
+
+Example:
+    python synth_org.py --out bench_fixture --repos 20 --mirror
+    python bench.py --fixture bench_fixture --runs 3 --latency-ms 20 --tokens 2
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+from typing import Dict, List, Optional
+
+import ghes_stub
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = "bench_history.jsonl"
+
+
+# --- Inputs ---
+def _write_urls(path: str, urls: List[str], header: Optional[str] = None) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        if header:
+            writer.writerow([header])
+        for url in urls:
+            writer.writerow([url])
+
+
+def _repo_urls(fixture: Dict, web: str, org: str) -> List[str]:
+    return [f"{web}/{org}/{name}" for name in fixture["orgs"][org]["repos"]]
+
+
+# Each entry: script file, whether it sweeps every org, and how to prepare its input
+SCRIPTS: Dict[str, Dict] = {
+    "disabled": {"file": "disable.py"},
+    "size": {"file": "size.py"},
+    "testsize": {"file": "testSize.py"},
+    "issues": {"file": "hireME.py"},
+    "tags": {"file": "test.py"},
+    "binary": {"file": "Bin.py", "all_orgs": True},
+    "largefile": {"file": "largefile400.py", "input": lambda d, urls: _write_urls(os.path.join(d, "urlTestGreater.csv"), urls)},
+    "wiki": {"file": "wikiCheck.py", "input": lambda d, urls: _write_urls(os.path.join(d, "input.csv"), urls)},
+    "wikiapi": {"file": "wik.py", "input": lambda d, urls: _write_urls(os.path.join(d, "input.csv"), urls, header="url")},
+    "static": {"file": "static.py", "input": lambda d, urls: _write_urls(os.path.join(d, "repo_links.csv"), urls, header="url")},
+}
+
+
+def script_env(web: str, org: str, tokens: List[str]) -> Dict[str, str]:
+    api = f"{web}/api/v3"
+    joined = ",".join(tokens)
+    env = {**os.environ, "PYTHONPATH": REPO_DIR}
+    env.update({
+        "GITHUB_API_URL": api, "GHES_API_URL": api, "GHES_WEB_URL": web, "GHES_BASE_URL": api,
+        "GITHUB_ORG": org, "GHES_ORG": org,
+        "SOURCE_BASE_URL": api, "SOURCE_ORG": org,
+        "DESTINATION_API_URL": api, "DESTINATION_ORG": f"{org}-dest",
+    })
+    for name in ("GITHUB_TOKEN", "GHES_TOKEN", "SOURCE_TOKEN", "DESTINATION_TOKEN"):
+        env[name] = tokens[0]
+        env[f"{name}S"] = joined
+    return env
+
+
+# --- History ---
+def git_revision() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _config_key(record: Dict) -> tuple:
+    return (record["script"], record["fixture"], record["latency_ms"], record["rate_limit"], record["tokens"])
+
+
+# --- Runner ---
+def run_script(name: str, spec: Dict, fixture: Dict, web: str, org: str, tokens: List[str], timeout: int) -> Dict:
+    orgs = list(fixture["orgs"]) if spec.get("all_orgs") else [org]
+    repos = sum(len(fixture["orgs"][o]["repos"]) for o in orgs)
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        if "input" in spec:
+            spec["input"](workdir, _repo_urls(fixture, web, org))
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, spec["file"])],
+                cwd=workdir, env=script_env(web, org, tokens),
+                capture_output=True, text=True, timeout=timeout,
+            )
+            returncode, stderr = result.returncode, result.stderr
+        except subprocess.TimeoutExpired:
+            returncode, stderr = -1, "timeout"
+        seconds = time.perf_counter() - start
+    if returncode != 0:
+        print(f"  ⚠️ {name} exited {returncode}: {stderr.strip().splitlines()[-1:]}")
+    return {"script": name, "seconds": round(seconds, 3), "repos": repos,
+            "repos_per_sec": round(repos / seconds, 2) if seconds else 0.0, "returncode": returncode}
+
+
+def summarize(records: List[Dict], history: List[Dict]) -> None:
+    print(f"\n{'script':<10} {'runs':>4} {'median s':>9} {'repos/s':>8} {'prev repos/s':>13} {'change':>8}")
+    by_script: Dict[str, List[Dict]] = {}
+    for record in records:
+        by_script.setdefault(record["script"], []).append(record)
+    for name, runs in by_script.items():
+        runs = [r for r in runs if r["returncode"] == 0]
+        if not runs:
+            print(f"{name:<10} {'failed':>4}")
+            continue
+        median_s = statistics.median(r["seconds"] for r in runs)
+        rate = statistics.median(r["repos_per_sec"] for r in runs)
+        previous = [h["repos_per_sec"] for h in history if _config_key(h) == _config_key(runs[0]) and h["returncode"] == 0]
+        prev = statistics.median(previous) if previous else None
+        change = f"{(rate - prev) / prev * 100:+.1f}%" if prev else "-"
+        print(f"{name:<10} {len(runs):>4} {median_s:>9.2f} {rate:>8.2f} {prev if prev is not None else '-':>13} {change:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the scripts against the local GHES stub")
+    parser.add_argument("--fixture", default="bench_fixture", help="directory written by synth_org.py")
+    parser.add_argument("--org", help="org to benchmark (default: first generated org)")
+    parser.add_argument("--scripts", nargs="*", default=list(SCRIPTS), choices=list(SCRIPTS))
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--tokens", type=int, default=1, help="number of tokens handed to the token pool")
+    parser.add_argument("--timeout", type=int, default=1800)
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    args = parser.parse_args()
+
+    tokens = [f"bench-token-{i:04d}" for i in range(args.tokens)]
+    server, _ = ghes_stub.serve(
+        args.fixture, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_limit=args.rate_limit,
+    )
+    web = f"http://127.0.0.1:{server.server_address[1]}"
+    fixture = server.state.fixture
+    org = args.org or next(o for o, data in fixture["orgs"].items() if "mirror_of" not in data)
+    history = load_history(args.history)
+    revision = git_revision()
+
+    records = []
+    try:
+        for run in range(args.runs):
+            for name in args.scripts:
+                print(f"[run {run + 1}/{args.runs}] {name}")
+                record = run_script(name, SCRIPTS[name], fixture, web, org, tokens, args.timeout)
+                record.update({
+                    "ts": time.time(), "run": run, "revision": revision, "fixture": fixture.get("digest", ""),
+                    "latency_ms": args.latency_ms, "rate_limit": args.rate_limit, "tokens": args.tokens,
+                })
+                records.append(record)
+    finally:
+        server.shutdown()
+
+    with open(args.history, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    summarize(records, history)
+    print(f"\n✅ {len(records)} result(s) appended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
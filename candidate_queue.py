@@ -0,0 +1,154 @@
+"""
+Streams large-file scan candidates straight from the MongoDB metadata store.
+
+Replaces the export-to-urlTestGreater.csv step in sizePlan.txt: a sorted cursor over
+repos with raw_size_bytes > 400MB feeds the scanner directly, so the first clone
+starts as soon as the first document arrives. A background thread keeps reading
+ahead into a bounded queue while the current repo is being scanned.
+
+SCAN_ORDER=largest   biggest repos first (no long-tail stragglers at the end)
+SCAN_ORDER=smallest  smallest first (fast early results)
+
+Works with any pymongo-compatible collection, including mongomock.
+"""
+
+import os
+import csv
+import time
+import queue
+import logging
+import threading
+from typing import Iterable, Iterator, Optional
+
+# --- Config ---
+MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME: str = os.getenv("MONGO_DB", "your_database_name")
+REPO_COLLECTION: str = os.getenv("MONGO_REPO_COLLECTION", "ghes_repositories")
+SIZE_FIELD: str = os.getenv("MONGO_SIZE_FIELD", "raw_size_bytes")
+URL_FIELD: str = os.getenv("MONGO_URL_FIELD", "repo_url")
+GHES_WEB_URL: str = os.getenv("GHES_WEB_URL", "https://github-test.qualcomm.com")
+MIN_SIZE_BYTES: int = int(os.getenv("CANDIDATE_MIN_SIZE_BYTES", str(400 * 1024 * 1024)))
+SCAN_ORDER: str = os.getenv("SCAN_ORDER", "largest")
+BATCH_SIZE: int = int(os.getenv("CANDIDATE_BATCH_SIZE", "50"))
+PREFETCH: int = int(os.getenv("CANDIDATE_PREFETCH", "200"))
+MAX_CURSOR_RESUMES: int = int(os.getenv("CANDIDATE_MAX_CURSOR_RESUMES", "10"))
+
+ORDERS = {"largest": -1, "smallest": 1}
+
+
+def candidate_url(doc: dict) -> Optional[str]:
+    if doc.get(URL_FIELD):
+        return doc[URL_FIELD]
+    if doc.get("owner_name") and doc.get("repo_name"):
+        return f"{GHES_WEB_URL}/{doc['owner_name']}/{doc['repo_name']}"
+    return None
+
+
+def _cursor_errors() -> tuple:
+    try:
+        from pymongo.errors import CursorNotFound
+    except ImportError:
+        return ()
+    return (CursorNotFound,)
+
+
+def mongo_candidates(
+    collection,
+    order: str = SCAN_ORDER,
+    min_size: int = MIN_SIZE_BYTES,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[str]:
+    """
+    Yields candidate repo URLs in size order straight off the cursor.
+
+    The cursor sits idle while the read-ahead queue is full of slow clones, so the
+    server may time it out (CursorNotFound). The query then resumes from the last
+    size yielded, skipping the documents already seen at that size. Resumes that
+    make no progress back off and give up after MAX_CURSOR_RESUMES in a row.
+    """
+    if order not in ORDERS:
+        raise ValueError(f"Unknown SCAN_ORDER '{order}' (expected one of {', '.join(ORDERS)})")
+    cursor_errors = _cursor_errors()
+    failures = 0
+    last_size = None
+    seen_at_last_size: set = set()
+    while True:
+        query = {SIZE_FIELD: {"$gt": min_size}}
+        if last_size is not None:
+            query[SIZE_FIELD]["$lte" if ORDERS[order] < 0 else "$gte"] = last_size
+        cursor = (
+            collection.find(query, projection={URL_FIELD: 1, "owner_name": 1, "repo_name": 1, SIZE_FIELD: 1})
+            .sort(SIZE_FIELD, ORDERS[order])
+            .batch_size(batch_size)
+        )
+        try:
+            for doc in cursor:
+                size = doc.get(SIZE_FIELD)
+                if size == last_size and doc["_id"] in seen_at_last_size:
+                    continue
+                if size != last_size:
+                    last_size, seen_at_last_size = size, set()
+                seen_at_last_size.add(doc["_id"])
+                failures = 0
+                url = candidate_url(doc)
+                if url:
+                    yield url
+                else:
+                    logging.warning(f"Candidate {doc.get('_id')} has no URL; skipping")
+            return
+        except cursor_errors as e:
+            failures += 1
+            if failures > MAX_CURSOR_RESUMES:
+                raise
+            logging.warning(f"Candidate cursor expired ({e}); resuming from size {last_size} (attempt {failures})")
+            time.sleep(min(2 ** (failures - 1), 30))
+
+
+def connect_candidates(order: str = SCAN_ORDER) -> Iterator[str]:
+    from pymongo import MongoClient
+
+    client = MongoClient(MONGO_URI)
+    return mongo_candidates(client[DB_NAME][REPO_COLLECTION], order=order)
+
+
+_DONE = object()
+
+
+def prefetch(items: Iterable, maxsize: int = PREFETCH) -> Iterator:
+    """Reads items on a background thread into a bounded queue so I/O overlaps with scanning."""
+    buffer: queue.Queue = queue.Queue(maxsize=maxsize)
+    errors = []
+
+    def producer() -> None:
+        try:
+            for item in items:
+                buffer.put(item)
+        except Exception as e:  # surfaced to the consumer below
+            errors.append(e)
+        finally:
+            buffer.put(_DONE)
+
+    threading.Thread(target=producer, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is _DONE:
+            break
+        yield item
+    if errors:
+        raise errors[0]
+
+
+def main() -> None:
+    """Exports the candidates in scan order to urlTestGreater.csv (the old step 1 output)."""
+    output = os.getenv("CANDIDATE_CSV", "urlTestGreater.csv")
+    count = 0
+    with open(output, "w", newline="") as f:
+        writer = csv.writer(f)
+        for url in connect_candidates():
+            writer.writerow([url])
+            count += 1
+    print(f"✅ {count} candidate(s) written to {output} ({SCAN_ORDER} first)")
+
+
+if __name__ == "__main__":
+    main()
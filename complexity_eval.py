@@ -0,0 +1,233 @@
+"""
+Early-exit org complexity evaluator.
+
+Same reclassification as agg.txt, but instead of scanning every complex repo for
+every blocker, each HARD_STOP_FIELDS probe is a single indexed lookup, and probes
+run cheapest-per-hit first. An org is marked "Still Complex" as soon as one
+hard-stop is confirmed. Set FULL_DETAIL=true to get every flag for every org
+(the original full aggregation).
+
+Probe timings and hit rates are kept in PROBE_STATS_FILE so the ordering improves
+from run to run.
+"""
+
+import os
+import csv
+import json
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+import metrics
+
+# --- Config ---
+MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME: str = os.getenv("MONGO_DB", "your_database_name")
+ORG_COLLECTION: str = "ghes_organizations"
+REPO_COLLECTION: str = "ghes_repositories"
+CSV_OUTPUT_PATH: str = os.getenv("CSV_OUTPUT_PATH", "reclassified_orgs.csv")
+PROBE_STATS_FILE: str = os.getenv("PROBE_STATS_FILE", "probe_stats.json")
+FULL_DETAIL: bool = os.getenv("FULL_DETAIL", "false").lower() == "true"
+
+# --- Blockers & Fields ---
+ALL_FIELDS: List[str] = [
+    "has_webhooks", "has_actions", "has_runners", "has_branch_protections",
+    "has_releases", "has_cci_red", "has_issues", "has_pages", "has_wiki",
+    "has_binary_files", "has_pull_requests", "size", "branches"
+]
+
+HARD_STOP_FIELDS: List[str] = [
+    "has_webhooks", "has_actions", "has_runners", "has_branch_protections",
+    "has_releases", "has_cci_red"
+]
+
+STILL_COMPLEX: str = "Still Complex"
+MEDIUM: str = "Medium"
+
+
+class ProbeStats:
+    """Running cost/hit-rate for one probe, smoothed so unseen probes still get tried."""
+
+    def __init__(self, calls: int = 0, hits: int = 0, seconds: float = 0.0) -> None:
+        self.calls = calls
+        self.hits = hits
+        self.seconds = seconds
+
+    def record(self, elapsed: float, hit: bool) -> None:
+        self.calls += 1
+        self.hits += int(hit)
+        self.seconds += elapsed
+
+    def expected_cost_per_hit(self) -> float:
+        # For independent yes/no checks, running them in ascending cost / P(hit)
+        # minimises the expected cost of finding the first hit.
+        mean_cost = (self.seconds + 0.01) / (self.calls + 1)
+        hit_rate = (self.hits + 1) / (self.calls + 2)
+        return mean_cost / hit_rate
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"calls": self.calls, "hits": self.hits, "seconds": round(self.seconds, 6)}
+
+
+class HardStopEvaluator:
+    """
+    Runs named boolean probes against an org in cost-per-hit order.
+
+    probes maps a field name to a callable(org_name) -> bool.
+    """
+
+    def __init__(self, probes: Dict[str, Callable[[str], bool]], stats_file: Optional[str] = None) -> None:
+        self.probes = probes
+        self.stats_file = stats_file
+        self.stats: Dict[str, ProbeStats] = {name: ProbeStats() for name in probes}
+        if stats_file and os.path.exists(stats_file):
+            with open(stats_file) as f:
+                for name, data in json.load(f).items():
+                    if name in self.stats:
+                        self.stats[name] = ProbeStats(**data)
+
+    def order(self) -> List[str]:
+        return sorted(self.probes, key=lambda name: self.stats[name].expected_cost_per_hit())
+
+    def evaluate(self, org_name: str, full: bool = False) -> Dict[str, Optional[bool]]:
+        """
+        Returns {field: True/False/None}. None means the probe was skipped because
+        an earlier probe already confirmed a hard-stop (only when full is False).
+        """
+        results: Dict[str, Optional[bool]] = {name: None for name in self.probes}
+        for name in self.order():
+            start = time.perf_counter()
+            hit = bool(self.probes[name](org_name))
+            elapsed = time.perf_counter() - start
+            self.stats[name].record(elapsed, hit)
+            metrics.timing("probe.duration", elapsed * 1000, probe=name, hit=hit)
+            results[name] = hit
+            if hit and not full:
+                logging.info(f"{org_name}: hard-stop '{name}' confirmed, skipping remaining probes")
+                break
+        return results
+
+    def save_stats(self) -> None:
+        if not self.stats_file:
+            return
+        with open(self.stats_file, "w") as f:
+            json.dump({name: s.to_dict() for name, s in self.stats.items()}, f, indent=2)
+
+
+# --- Mongo probes ---
+def mongo_field_probe(repos_col, field: str) -> Callable[[str], bool]:
+    """One indexed point lookup: does any complex repo in the org have this factor set?"""
+    def probe(org_name: str) -> bool:
+        return repos_col.find_one(
+            {
+                "owner_name": org_name,
+                "complexity_score": "Complex",
+                f"complexity_factors.{field}": "Complex",
+            },
+            projection={"_id": 1},
+        ) is not None
+    return probe
+
+
+def any_hard_stop_probe(repos_col) -> Callable[[str], bool]:
+    """
+    One query for the common (Medium) case: does any complex repo in the org set
+    any hard-stop factor? Only orgs that answer yes go through the ordered probes.
+    """
+    def probe(org_name: str) -> bool:
+        return repos_col.find_one(
+            {
+                "owner_name": org_name,
+                "complexity_score": "Complex",
+                "$or": [{f"complexity_factors.{field}": "Complex"} for field in HARD_STOP_FIELDS],
+            },
+            projection={"_id": 1},
+        ) is not None
+    return probe
+
+
+def ensure_indexes(repos_col) -> None:
+    # Every probe (and the full pass) filters on owner_name + complexity_score first
+    repos_col.create_index([("owner_name", 1), ("complexity_score", 1)])
+
+
+def full_org_flags(repos_col, org_name: str) -> Dict[str, str]:
+    """The original agg.txt pass: every flag for every complex repo in the org."""
+    org_flags = {field: "Simple" for field in ALL_FIELDS}
+    repos = repos_col.find(
+        {"owner_name": org_name, "complexity_score": "Complex"},
+        projection={"complexity_factors": 1},
+    )
+    for repo in repos:
+        factors = repo.get("complexity_factors", {})
+        for field in ALL_FIELDS:
+            if factors.get(field) == "Complex":
+                org_flags[field] = "Complex"
+    return org_flags
+
+
+def classify_org(
+    evaluator: HardStopEvaluator,
+    repos_col,
+    org_name: str,
+    full: bool = False,
+    screen: Optional[Callable[[str], bool]] = None,
+) -> Dict[str, str]:
+    if full:
+        org_flags = full_org_flags(repos_col, org_name)
+        still_complex = any(org_flags[field] == "Complex" for field in HARD_STOP_FIELDS)
+    elif screen is not None and not screen(org_name):
+        # No hard-stop anywhere in the org: one query instead of one probe per field
+        metrics.incr("probe.screened_out")
+        org_flags = {field: "Simple" if field in HARD_STOP_FIELDS else "" for field in ALL_FIELDS}
+        still_complex = False
+    else:
+        # Only hard-stop fields are probed; anything not probed is left blank
+        results = evaluator.evaluate(org_name)
+        org_flags = {field: "" for field in ALL_FIELDS}
+        for field, hit in results.items():
+            if hit is not None:
+                org_flags[field] = "Complex" if hit else "Simple"
+        still_complex = any(results.values())
+    return {**org_flags, "final_classification": STILL_COMPLEX if still_complex else MEDIUM}
+
+
+def main() -> None:
+    from pymongo import MongoClient
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    orgs_col = db[ORG_COLLECTION]
+    repos_col = db[REPO_COLLECTION]
+    ensure_indexes(repos_col)
+    screen = any_hard_stop_probe(repos_col)
+
+    evaluator = HardStopEvaluator(
+        {field: mongo_field_probe(repos_col, field) for field in HARD_STOP_FIELDS},
+        stats_file=PROBE_STATS_FILE,
+    )
+    logging.info(f"Probe order: {evaluator.order()} (full detail: {FULL_DETAIL})")
+
+    output_rows = []
+    for org in orgs_col.find({"complexity_score": "Complex"}, projection={"org_name": 1, "org_url": 1}):
+        org_name = org.get("org_name")
+        output_rows.append({
+            "org_name": org_name,
+            "org_url": org.get("org_url", ""),
+            **classify_org(evaluator, repos_col, org_name, full=FULL_DETAIL, screen=screen),
+        })
+
+    evaluator.save_stats()
+
+    with metrics.stage("csv_write"), open(CSV_OUTPUT_PATH, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["org_name", "org_url"] + ALL_FIELDS + ["final_classification"])
+        writer.writeheader()
+        writer.writerows(output_rows)
+
+    print(f"✅ CSV written: {CSV_OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    metrics.run_main(main)
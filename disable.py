@@ -1,25 +1,23 @@
 import os
-import requests
 import csv
 from dotenv import load_dotenv
+import metrics
+from token_pool import TokenPool
 
 # Load environment variables
 load_dotenv()
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 ORG_NAME = os.getenv("GITHUB_ORG")
-BASE_URL = "https://api.github.com"
+BASE_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
 
-headers = {
-    "Authorization": f"token {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github+json"
-}
+# One disabled repo already makes the org complex; set FULL_DETAIL=true to check every repo anyway
+FULL_DETAIL = os.getenv("FULL_DETAIL", "false").lower() == "true"
 
-def get_repos_from_org(org_name):
+def get_repos_from_org(pool, org_name):
     repos = []
     page = 1
     while True:
         url = f"{BASE_URL}/orgs/{org_name}/repos?per_page=100&page={page}"
-        response = requests.get(url, headers=headers)
+        response = pool.get(url, org=org_name)
         if response.status_code != 200:
             print(f"Failed to fetch repos: {response.status_code}")
             break
@@ -35,9 +33,9 @@ def get_repos_from_org(org_name):
 
     return repos
 
-def check_repo_disabled(org, repo_name):
+def check_repo_disabled(pool, org, repo_name):
     url = f"{BASE_URL}/repos/{org}/{repo_name}"
-    response = requests.get(url, headers=headers)
+    response = pool.get(url, org=org)
 
     if response.status_code == 404:
         print(f"Repo: {repo_name} - Status: 404 (Assumed Disabled)")
@@ -63,8 +61,11 @@ def write_csv_output(repo_results, org_complex):
     print(f"\n📁 CSV saved as: {output_file}")
 
 def main():
+    # GITHUB_TOKENS (comma-separated) and/or GITHUB_TOKEN
+    pool = TokenPool.from_env("GITHUB_TOKEN", BASE_URL)
+
     print(f"Fetching repos for org: {ORG_NAME}")
-    repo_names = get_repos_from_org(ORG_NAME)
+    repo_names = get_repos_from_org(pool, ORG_NAME)
 
     if not repo_names:
         print("No repositories found or API failed.")
@@ -74,17 +75,22 @@ def main():
     has_disabled = False
 
     for repo in repo_names:
-        disabled = check_repo_disabled(ORG_NAME, repo)
+        with metrics.stage("check_disabled", org=ORG_NAME, repo=repo):
+            disabled = check_repo_disabled(pool, ORG_NAME, repo)
         repo_results[repo] = disabled
         if disabled:
             has_disabled = True
+            if not FULL_DETAIL:
+                print(f"Stopping after '{repo}': org already complex ({len(repo_results)}/{len(repo_names)} repos checked)")
+                break
 
     if has_disabled:
         print(f"\n🔴 Org '{ORG_NAME}' is marked COMPLEX due to disabled repos.")
     else:
         print(f"\n🟢 Org '{ORG_NAME}' has no disabled repos — NOT complex.")
 
-    write_csv_output(repo_results, has_disabled)
+    with metrics.stage("csv_write"):
+        write_csv_output(repo_results, has_disabled)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    metrics.run_main(main)
\ No newline at end of file
@@ -0,0 +1,442 @@
+"""
+Local GHES stand-in for benchmarks and regression runs.
+
+Serves a fixture produced by synth_org.py:
+
+    REST     /api/v3/user/orgs, /orgs/{org}, /orgs/{org}/repos, /repos/{o}/{r},
+             /repos/{o}/{r}/issues[/{n}], /tags, /contents/{path}, /git/trees/{sha}, /rate_limit
+    GraphQL  /api/graphql (repository issues connection)
+    Wiki     /{o}/{r}/wiki/, /{o}/{r}/wiki/_pages, /{o}/{r}/wiki/{page}, /{o}/{r}/wiki/uploads/...
+    Git      /{o}/{r}[.git] and /{o}/{r}.wiki.git over smart HTTP (git http-backend)
+
+Latency (--latency-ms / --jitter-ms) and per-token rate limiting (--rate-limit per
+--rate-window seconds) can be injected. Point scripts at it with e.g.
+GITHUB_API_URL=http://127.0.0.1:8765/api/v3 and GHES_WEB_URL=http://127.0.0.1:8765.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+DEFAULT_LIMIT = 5000
+
+
+class StubState:
+    def __init__(
+        self,
+        fixture_dir: str,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        rate_limit: int = 0,
+        rate_window: int = 3600,
+        valid_tokens: Optional[List[str]] = None,
+    ) -> None:
+        with open(os.path.join(fixture_dir, "fixture.json")) as f:
+            self.fixture: Dict = json.load(f)
+        self.git_root: str = os.path.abspath(os.path.join(fixture_dir, "git"))
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.valid_tokens = set(valid_tokens or [])
+        self.budgets: Dict[str, List[float]] = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def org(self, name: str) -> Optional[Dict]:
+        return self.fixture["orgs"].get(name)
+
+    def repo(self, org: str, name: str) -> Optional[Dict]:
+        org_data = self.org(org)
+        return org_data["repos"].get(name) if org_data else None
+
+    def delay(self) -> None:
+        pause = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if pause > 0:
+            time.sleep(pause / 1000)
+
+    def spend(self, token: str) -> Tuple[int, int, int]:
+        """Charges one request to the token; returns (limit, remaining, reset_epoch)."""
+        with self._lock:
+            self.request_count += 1
+            limit = self.rate_limit or DEFAULT_LIMIT
+            now = time.time()
+            remaining, reset_at = self.budgets.get(token, [limit, now + self.rate_window])
+            if now >= reset_at:
+                remaining, reset_at = limit, now + self.rate_window
+            if self.rate_limit:
+                remaining -= 1
+            self.budgets[token] = [remaining, reset_at]
+            return limit, int(remaining), int(reset_at)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "GHESStub/1.0"
+
+    @property
+    def state(self) -> StubState:
+        return self.server.state
+
+    def log_message(self, format: str, *args) -> None:
+        if os.getenv("GHES_STUB_VERBOSE"):
+            super().log_message(format, *args)
+
+    # --- Plumbing ---
+    @property
+    def web_base(self) -> str:
+        return f"http://{self.headers.get('Host')}"
+
+    @property
+    def api_base(self) -> str:
+        return f"{self.web_base}/api/v3"
+
+    def _token(self) -> str:
+        auth = self.headers.get("Authorization", "")
+        return auth.split(" ", 1)[1] if " " in auth else ""
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _json(self, status: int, payload, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps(payload).encode(), "application/json; charset=utf-8", headers)
+
+    def _html(self, status: int, html: str) -> None:
+        self._send(status, html.encode(), "text/html; charset=utf-8")
+
+    def _not_found(self) -> None:
+        self._json(404, {"message": "Not Found"})
+
+    # --- Verbs ---
+    def do_GET(self) -> None:
+        self._dispatch()
+
+    def do_HEAD(self) -> None:
+        self._dispatch()
+
+    def do_POST(self) -> None:
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        parsed = urlparse(self.path)
+        path, query = parsed.path, parse_qs(parsed.query)
+        git = re.match(r"^/([^/]+)/([^/]+?)(?:\.git)?/(info/refs|git-upload-pack|HEAD|objects/.+)$", path)
+        if git:
+            org, repo, rest = git.groups()
+            return self._git(f"/{org}/{repo}.git/{rest}", parsed.query)
+        self.state.delay()
+        if path == "/api/graphql":
+            return self._graphql_entry()
+        if path.startswith("/api/v3"):
+            return self._api_entry(path[len("/api/v3"):] or "/", query)
+        wiki = re.match(r"^/([^/]+)/([^/]+)/wiki(?:/(.*))?$", path)
+        if wiki:
+            return self._wiki(*wiki.groups())
+        self._not_found()
+
+    # --- REST ---
+    def _api_entry(self, path: str, query: Dict[str, List[str]]) -> None:
+        token = self._token()
+        if self.state.valid_tokens and token not in self.state.valid_tokens:
+            return self._json(401, {"message": "Bad credentials"})
+        if path == "/rate_limit":
+            return self._rate_limit(token)
+        limit, remaining, reset_at = self.state.spend(token)
+        rate_headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(max(remaining, 0)),
+            "X-RateLimit-Reset": str(reset_at),
+        }
+        if remaining < 0:
+            return self._json(403, {"message": "API rate limit exceeded"}, rate_headers)
+        status, payload, extra = self._api(path, query)
+        self._json(status, payload, {**rate_headers, **extra})
+
+    def _rate_limit(self, token: str) -> None:
+        limit = self.state.rate_limit or DEFAULT_LIMIT
+        remaining, reset_at = self.state.budgets.get(token, [limit, time.time() + self.state.rate_window])
+        core = {"limit": limit, "remaining": int(max(remaining, 0)), "reset": int(reset_at), "used": int(limit - remaining)}
+        self._json(200, {"resources": {"core": core, "search": core, "graphql": core}, "rate": core})
+
+    def _paginate(self, path: str, query: Dict[str, List[str]], items: List) -> Tuple[int, List, Dict[str, str]]:
+        page = int(query.get("page", ["1"])[0])
+        per_page = min(int(query.get("per_page", ["30"])[0]), 100)
+        start = (page - 1) * per_page
+        headers: Dict[str, str] = {}
+        if start + per_page < len(items):
+            params = {k: v[0] for k, v in query.items()}
+            last = (len(items) + per_page - 1) // per_page
+            next_url = f"{self.api_base}{path}?{urlencode({**params, 'page': page + 1, 'per_page': per_page})}"
+            last_url = f"{self.api_base}{path}?{urlencode({**params, 'page': last, 'per_page': per_page})}"
+            headers["Link"] = f'<{next_url}>; rel="next", <{last_url}>; rel="last"'
+        return 200, items[start:start + per_page], headers
+
+    def _api(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, object, Dict[str, str]]:
+        if path == "/user/orgs":
+            return self._paginate(path, query, [self._org_json(o) for o in self.state.fixture["orgs"]])
+
+        match = re.match(r"^/orgs/([^/]+)(/repos)?/?$", path)
+        if match:
+            org, repos = match.groups()
+            if not self.state.org(org):
+                return 404, {"message": "Not Found"}, {}
+            if not repos:
+                return 200, self._org_json(org), {}
+            items = [self._repo_json(org, r) for r in self.state.org(org)["repos"].values()]
+            return self._paginate(path, query, items)
+
+        match = re.match(r"^/repos/([^/]+)/([^/]+)(?:/(.*))?$", path)
+        if match:
+            org, name, rest = match.groups()
+            repo = self.state.repo(org, name)
+            if not repo:
+                return 404, {"message": "Not Found"}, {}
+            rest = (rest or "").rstrip("/")
+            if not rest:
+                return 200, self._repo_json(org, repo), {}
+            if rest == "issues":
+                state = query.get("state", ["open"])[0]
+                issues = [self._issue_json(org, name, i) for i in repo["issues"] if state == "all" or i["state"] == state]
+                return self._paginate(path, query, issues)
+            if rest.startswith("issues/"):
+                number = rest[len("issues/"):]
+                issue = next((i for i in repo["issues"] if str(i["number"]) == number), None)
+                return (200, self._issue_json(org, name, issue), {}) if issue else (404, {"message": "Not Found"}, {})
+            if rest == "tags":
+                tags = [{"name": t["name"], "commit": {"sha": t["sha"], "url": f"{self.api_base}/repos/{org}/{name}/commits/{t['sha']}"}} for t in repo["tags"]]
+                return self._paginate(path, query, tags)
+            if rest == "contents" or rest.startswith("contents/"):
+                return self._contents(org, name, repo, rest[len("contents"):].strip("/"))
+            if rest.startswith("git/trees/"):
+                return 200, self._tree(repo), {}
+        return 404, {"message": "Not Found"}, {}
+
+    def _org_json(self, org: str) -> Dict:
+        return {
+            "login": org,
+            "id": int(hashlib.md5(org.encode()).hexdigest()[:8], 16),
+            "url": f"{self.api_base}/orgs/{org}",
+            "repos_url": f"{self.api_base}/orgs/{org}/repos",
+            "type": "Organization",
+        }
+
+    def _repo_json(self, org: str, repo: Dict) -> Dict:
+        name = repo["name"]
+        return {
+            "id": int(hashlib.md5(f"{org}/{name}".encode()).hexdigest()[:8], 16),
+            "name": name,
+            "full_name": f"{org}/{name}",
+            "owner": {"login": org, "type": "Organization"},
+            "private": False,
+            "url": f"{self.api_base}/repos/{org}/{name}",
+            "html_url": f"{self.web_base}/{org}/{name}",
+            "clone_url": f"{self.web_base}/{org}/{name}.git",
+            "size": repo["size_kb"],
+            "archived": repo.get("archived", False),
+            "disabled": repo.get("disabled", False),
+            "has_wiki": repo.get("has_wiki", False),
+            "default_branch": "main",
+            "pushed_at": "2024-06-01T00:00:00Z",
+            "updated_at": "2024-06-01T00:00:00Z",
+        }
+
+    def _issue_json(self, org: str, name: str, issue: Dict) -> Dict:
+        return {
+            "id": issue["number"],
+            "number": issue["number"],
+            "title": issue["title"],
+            "body": issue["body"],
+            "state": issue["state"],
+            "comments": issue["comments"],
+            "updated_at": issue["updated_at"],
+            "url": f"{self.api_base}/repos/{org}/{name}/issues/{issue['number']}",
+            "html_url": f"{self.web_base}/{org}/{name}/issues/{issue['number']}",
+        }
+
+    def _contents(self, org: str, name: str, repo: Dict, path: str) -> Tuple[int, object, Dict[str, str]]:
+        prefix = f"{path}/" if path else ""
+        entries: Dict[str, Dict] = {}
+        for item in repo["files"]:
+            if item["path"] == path:
+                return 200, {"type": "file", "name": os.path.basename(path), "path": path, "size": item["size"],
+                             "url": f"{self.api_base}/repos/{org}/{name}/contents/{path}"}, {}
+            if not item["path"].startswith(prefix):
+                continue
+            child = item["path"][len(prefix):].split("/", 1)[0]
+            child_path = prefix + child
+            is_dir = "/" in item["path"][len(prefix):]
+            entries.setdefault(child, {
+                "type": "dir" if is_dir else "file",
+                "name": child,
+                "path": child_path,
+                "size": 0 if is_dir else item["size"],
+                "url": f"{self.api_base}/repos/{org}/{name}/contents/{child_path}",
+            })
+        if not entries:
+            return 404, {"message": "Not Found"}, {}
+        return 200, sorted(entries.values(), key=lambda e: e["name"]), {}
+
+    def _tree(self, repo: Dict) -> Dict:
+        tree, dirs = [], set()
+        for item in repo["files"]:
+            parts = item["path"].split("/")
+            for depth in range(1, len(parts)):
+                dirs.add("/".join(parts[:depth]))
+            tree.append({"path": item["path"], "type": "blob", "mode": "100644", "size": item["size"]})
+        tree.extend({"path": d, "type": "tree", "mode": "040000"} for d in sorted(dirs))
+        return {"sha": repo["sha"], "tree": tree, "truncated": False}
+
+    # --- GraphQL ---
+    def _graphql_entry(self) -> None:
+        token = self._token()
+        if self.state.valid_tokens and token not in self.state.valid_tokens:
+            return self._json(401, {"message": "Bad credentials"})
+        request = json.loads(self._read_body() or b"{}")
+        self.state.spend(token)
+        query, variables = request.get("query", ""), request.get("variables", {})
+        if "repository(" not in query or "issues(" not in query:
+            return self._json(200, {"errors": [{"message": "Query not supported by the GHES stub"}]})
+        repo = self.state.repo(variables.get("owner", ""), variables.get("name", ""))
+        if not repo:
+            return self._json(200, {"data": {"repository": None}, "errors": [{"type": "NOT_FOUND"}]})
+        first = min(int(variables.get("first", 100)), 100)
+        offset = int(variables.get("after") or 0)
+        page = repo["issues"][offset:offset + first]
+        end = offset + len(page)
+        nodes = [{
+            "number": i["number"],
+            "state": i["state"].upper(),
+            "title": i["title"],
+            "body": i["body"],
+            "updatedAt": i["updated_at"],
+            "comments": {"totalCount": i["comments"]},
+        } for i in page]
+        self._json(200, {"data": {"repository": {"issues": {
+            "totalCount": len(repo["issues"]),
+            "pageInfo": {"hasNextPage": end < len(repo["issues"]), "endCursor": str(end)},
+            "nodes": nodes,
+        }}}})
+
+    # --- Wiki HTML ---
+    def _wiki(self, org: str, name: str, page: Optional[str]) -> None:
+        repo = self.state.repo(org, name)
+        if not repo or not repo.get("has_wiki"):
+            return self._html(404, "<html><body>Not Found</body></html>")
+        page = (page or "").strip("/")
+        base = f"/{org}/{name}/wiki"
+        if page.startswith("uploads/"):
+            for attachments in repo["wiki_pages"].values():
+                for attachment in attachments:
+                    if attachment["path"] == page:
+                        return self._send(200, b"\0" * attachment["size"], "application/octet-stream")
+            return self._html(404, "<html><body>Not Found</body></html>")
+        if page in ("", "Home", "_pages"):
+            links = "".join(f'<li><a href="{base}/{p}">{p}</a></li>' for p in repo["wiki_pages"])
+            return self._html(200, f'<html><body><a href="{base}/_pages">Pages</a><ul>{links}</ul></body></html>')
+        if page not in repo["wiki_pages"]:
+            return self._html(404, "<html><body>Not Found</body></html>")
+        body = "".join(
+            f'<p><a href="{base}/{a["path"]}">{a["path"]}</a><img src="{base}/{a["path"]}"></p>'
+            for a in repo["wiki_pages"][page]
+        )
+        self._html(200, f"<html><body><h1>{page}</h1>{body}</body></html>")
+
+    # --- Git smart HTTP ---
+    def _git(self, path_info: str, query: str) -> None:
+        body = self._read_body() if self.command == "POST" else b""
+        env = {
+            **os.environ,
+            "GIT_PROJECT_ROOT": self.state.git_root,
+            "GIT_HTTP_EXPORT_ALL": "1",
+            "PATH_INFO": path_info,
+            "QUERY_STRING": query,
+            "REQUEST_METHOD": self.command,
+            "CONTENT_TYPE": self.headers.get("Content-Type", ""),
+            "CONTENT_LENGTH": str(len(body)),
+            "REMOTE_ADDR": self.client_address[0],
+        }
+        if self.headers.get("Content-Encoding"):
+            env["HTTP_CONTENT_ENCODING"] = self.headers["Content-Encoding"]
+        if self.headers.get("Git-Protocol"):
+            env["GIT_PROTOCOL"] = self.headers["Git-Protocol"]
+        result = subprocess.run(["git", "http-backend"], input=body, env=env, capture_output=True)
+        raw_headers, _, payload = result.stdout.partition(b"\r\n\r\n")
+        if not _:
+            raw_headers, _, payload = result.stdout.partition(b"\n\n")
+        status, headers = 200, {}
+        for line in raw_headers.decode(errors="replace").splitlines():
+            key, _, value = line.partition(":")
+            if key.lower() == "status":
+                status = int(value.strip().split()[0])
+            elif key:
+                headers[key.strip()] = value.strip()
+        content_type = headers.pop("Content-Type", "application/octet-stream")
+        self._send(status, payload, content_type, headers)
+
+
+def serve(fixture_dir: str, host: str = "127.0.0.1", port: int = 0, **options) -> Tuple[ThreadingHTTPServer, threading.Thread]:
+    """Starts the stub on a background thread; port 0 picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(fixture_dir, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local GHES stand-in server")
+    parser.add_argument("--fixture", default="bench_fixture")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per token per window (0 = unlimited)")
+    parser.add_argument("--rate-window", type=int, default=3600)
+    parser.add_argument("--token", action="append", dest="tokens", help="only accept these tokens (repeatable)")
+    args = parser.parse_args()
+
+    server, thread = serve(
+        args.fixture, args.host, args.port,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        rate_limit=args.rate_limit, rate_window=args.rate_window, valid_tokens=args.tokens,
+    )
+    host, port = server.server_address[:2]
+    print(f"GHES stub serving {args.fixture} on http://{host}:{port} (API: http://{host}:{port}/api/v3)")
+    try:
+        thread.join()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
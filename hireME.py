@@ -1,16 +1,19 @@
 """
 Compares GitHub issues across all repositories in a source vs. destination org.
 Reports any issues that are missing on either side.
+
+ISSUE_VALIDATION=content also compares each issue's state, title, body and comment
+count (updated_at too if ISSUE_DIGEST_IGNORE is cleared) using bucketed digests
+(see issue_digest.py) and writes the differences to CONTENT_CSV. Pull requests
+are excluded in both modes.
 """
 
 import os
-import csv
 import logging
 import traceback
-from typing import Dict, Set, Optional, List
+from contextlib import nullcontext
+from typing import Callable, Dict, Set, Optional, List
 from github import (
-    Github,
-    Auth,
     Repository,
     BadCredentialsException,
     RateLimitExceededException,
@@ -18,44 +21,44 @@ from github import (
 )
 from requests.exceptions import RequestException
 from dotenv import load_dotenv
+import metrics
+from issue_digest import IssueTuple, compare_content, describe, fetch_issue_tuples
+from report_sink import ReportWriter, report_path
+from token_pool import TokenPool, load_tokens
 
 # Load .env
 load_dotenv()
 
-# --- Logging Config ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-
 # --- Config ---
 SOURCE_BASE_URL: Optional[str] = os.getenv("SOURCE_BASE_URL")
-SOURCE_TOKEN: Optional[str] = os.getenv("SOURCE_TOKEN")
 SOURCE_ORG: Optional[str] = os.getenv("SOURCE_ORG")
 
-DESTINATION_TOKEN: Optional[str] = os.getenv("DESTINATION_TOKEN")
 DESTINATION_ORG: Optional[str] = os.getenv("DESTINATION_ORG")
+DESTINATION_API_URL: str = os.getenv("DESTINATION_API_URL", "https://api.github.com")
 
-OUTPUT_CSV: str = os.getenv("OUTPUT_CSV", "missing_issues_report.csv")
+# Tokens come from SOURCE_TOKENS/SOURCE_TOKEN and DESTINATION_TOKENS/DESTINATION_TOKEN
 
+OUTPUT_CSV: str = os.getenv("OUTPUT_CSV", "missing_issues_report.csv")
+REPORT_FIELDS: List[str] = ["Repository", "Direction", "Missing Issue Number"]
 
-# --- GitHub Auth ---
-def authenticate_github(token: str, base_url: Optional[str] = None) -> Github:
-    if base_url:
-        return Github(base_url=base_url, auth=Auth.Token(token))
-    return Github(auth=Auth.Token(token))
+# numbers: issue numbers only; content: also field-by-field content via bucketed digests
+ISSUE_VALIDATION: str = os.getenv("ISSUE_VALIDATION", "numbers").lower()
+CONTENT_CSV: str = os.getenv("CONTENT_CSV", "issue_content_mismatch_report.csv")
+CONTENT_FIELDS: List[str] = ["Repository", "Issue Number", "Field", "Source", "Destination"]
 
 
-def validate_auth(token: str, org_name: str, base_url: Optional[str] = None, label: str = "") -> Github:
-    if not token or len(token.strip()) < 10:
+# --- GitHub Auth ---
+def validate_auth(token_name: str, org_name: str, base_url: Optional[str] = None, label: str = "") -> TokenPool:
+    tokens: List[str] = [t for t in load_tokens(token_name) if len(t) >= 10]
+    if not tokens:
         raise ValueError(f"GitHub token is missing or malformed for {label}")
 
-    logging.info(f"Authenticating with {label} GitHub for org: {org_name}")
+    logging.info(f"Authenticating with {label} GitHub for org: {org_name} ({len(tokens)} token(s))")
     try:
-        gh: Github = authenticate_github(token.strip(), base_url)
-        gh.get_organization(org_name)
+        pool = TokenPool(tokens, base_url or DESTINATION_API_URL)
+        pool.github(org_name).get_organization(org_name)
         logging.info(f"Successfully authenticated with {label} GitHub.")
-        return gh
+        return pool
     except BadCredentialsException:
         raise ValueError(f"Invalid GitHub credentials for {label}")
     except Exception as e:
@@ -63,19 +66,34 @@ def validate_auth(token: str, org_name: str, base_url: Optional[str] = None, lab
 
 
 # --- Fetch Issues ---
-def fetch_issue_numbers(repo: Repository.Repository) -> Set[int]:
+def fetch_issue_numbers(
+    repo: Repository.Repository,
+    on_error: Optional[Callable[[Exception], None]] = None
+) -> Set[int]:
     issue_nums: Set[int] = set()
     try:
         issues = repo.get_issues(state='all')
         for issue in issues:
-            if not hasattr(issue, 'pull_request'):  # skip PRs
+            if issue.pull_request is None:  # skip PRs, as the GraphQL digests do
                 issue_nums.add(issue.number)
         logging.info(f"{repo.full_name}: {len(issue_nums)} issue(s) found")
     except Exception as e:
         logging.warning(f"Failed to fetch issues for {repo.full_name}: {e}")
+        if on_error:
+            on_error(e)
     return issue_nums
 
 
+def fetch_issue_digests(pool: TokenPool, org: str, repo: Repository.Repository) -> Dict[int, IssueTuple]:
+    try:
+        tuples = fetch_issue_tuples(pool, org, repo.full_name)
+        logging.info(f"{repo.full_name}: {len(tuples)} issue(s) digested")
+        return tuples
+    except Exception as e:
+        logging.warning(f"Failed to fetch issue digests for {repo.full_name}: {e}")
+        return {}
+
+
 # --- Compare ---
 def compare_issues(src: Set[int], dst: Set[int]) -> Dict[str, List[int]]:
     return {
@@ -84,72 +102,134 @@ def compare_issues(src: Set[int], dst: Set[int]) -> Dict[str, List[int]]:
     }
 
 
-# --- CSV Writer ---
-def write_csv(missing_data: List[Dict[str, str]]) -> None:
-    logging.info(f"Writing report to: {OUTPUT_CSV}")
-    with open(OUTPUT_CSV, "w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Repository", "Direction", "Missing Issue Number"])
-        for row in missing_data:
-            writer.writerow([row["repo"], row["direction"], row["issue"]])
-    logging.info("CSV write complete.")
+def write_content_mismatches(
+    report: ReportWriter,
+    repo_name: str,
+    src: Dict[int, IssueTuple],
+    dst: Dict[int, IssueTuple],
+    src_repo: Repository.Repository,
+    dst_repo: Repository.Repository
+) -> int:
+    # Full issues are fetched only for title/body mismatches, once per issue and side
+    full_issues: Dict = {}
+
+    def fetch_full(side: str, number: int):
+        if (side, number) not in full_issues:
+            metrics.incr("issues.deep_fetches", side=side)
+            full_issues[(side, number)] = (src_repo if side == "source" else dst_repo).get_issue(number)
+        return full_issues[(side, number)]
+
+    mismatches = compare_content(src, dst)
+    for number, field in mismatches:
+        src_value, dst_value = describe(field, src[number], dst[number], fetch_full)
+        report.write({
+            "Repository": repo_name,
+            "Issue Number": number,
+            "Field": field.replace("_hash", ""),
+            "Source": src_value,
+            "Destination": dst_value
+        })
+    return len(mismatches)
+
+
+# --- Report Writer ---
+def open_report() -> ReportWriter:
+    """Rows are streamed to disk in batches as each repo is compared."""
+    path = report_path(OUTPUT_CSV)
+    logging.info(f"Writing report to: {path}")
+    return ReportWriter(path, REPORT_FIELDS)
+
+
+def open_content_report():
+    if ISSUE_VALIDATION != "content":
+        return nullcontext()
+    path = report_path(CONTENT_CSV)
+    logging.info(f"Writing content mismatch report to: {path}")
+    return ReportWriter(path, CONTENT_FIELDS)
 
 
 # --- Main Logic ---
 def verify_org_issues() -> None:
+    # Configured here rather than at import, so importing this module has no side effects
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
     try:
         logging.info("Starting issue comparison across orgs...")
 
         # Auth
-        source_gh = validate_auth(SOURCE_TOKEN, SOURCE_ORG, SOURCE_BASE_URL, label="source")
-        dest_gh = validate_auth(DESTINATION_TOKEN, DESTINATION_ORG, label="destination")
+        source_pool = validate_auth("SOURCE_TOKEN", SOURCE_ORG, SOURCE_BASE_URL, label="source")
+        dest_pool = validate_auth("DESTINATION_TOKEN", DESTINATION_ORG, label="destination")
 
-        source_org = source_gh.get_organization(SOURCE_ORG)
-        dest_org = dest_gh.get_organization(DESTINATION_ORG)
+        source_org = source_pool.github(SOURCE_ORG).get_organization(SOURCE_ORG)
+        dest_org = dest_pool.github(DESTINATION_ORG).get_organization(DESTINATION_ORG)
 
         source_repos = {repo.name: repo for repo in source_org.get_repos()}
         dest_repos = {repo.name: repo for repo in dest_org.get_repos()}
 
         logging.info(f"Source repos: {len(source_repos)} | Destination repos: {len(dest_repos)}")
 
-        report_data: List[Dict[str, str]] = []
-
-        for repo_name, src_repo in source_repos.items():
-            if repo_name not in dest_repos:
-                logging.warning(f"Repo '{repo_name}' missing in destination org. Skipping.")
-                continue
-
-            dst_repo = dest_repos[repo_name]
-
-            src_issues = fetch_issue_numbers(src_repo)
-            dst_issues = fetch_issue_numbers(dst_repo)
-
-            diffs = compare_issues(src_issues, dst_issues)
-
-            for issue_num in diffs["missing_in_dest"]:
-                report_data.append({
-                    "repo": repo_name,
-                    "direction": "missing_in_destination",
-                    "issue": issue_num
-                })
-
-            for issue_num in diffs["missing_in_source"]:
-                report_data.append({
-                    "repo": repo_name,
-                    "direction": "missing_in_source",
-                    "issue": issue_num
-                })
-
-            if diffs["missing_in_dest"] or diffs["missing_in_source"]:
-                logging.warning(f"Issue mismatch in '{repo_name}': "
-                                f"{len(diffs['missing_in_dest'])} missing in destination, "
-                                f"{len(diffs['missing_in_source'])} missing in source.")
-            else:
-                logging.info(f"Issues match for '{repo_name}'.")
-
-        write_csv(report_data)
+        with open_report() as report, open_content_report() as content_report:
+            for repo_name, src_repo in source_repos.items():
+                if repo_name not in dest_repos:
+                    logging.warning(f"Repo '{repo_name}' missing in destination org. Skipping.")
+                    continue
+
+                # Re-bind each repo to whichever token currently has the most headroom
+                src_gh = source_pool.github(SOURCE_ORG)
+                dst_gh = dest_pool.github(DESTINATION_ORG)
+                src_repo = src_gh.get_repo(src_repo.full_name, lazy=True)
+                dst_repo = dst_gh.get_repo(dest_repos[repo_name].full_name, lazy=True)
+
+                if content_report is not None:
+                    with metrics.stage("fetch_source_digests", repo=repo_name):
+                        src_tuples = fetch_issue_digests(source_pool, SOURCE_ORG, src_repo)
+                    with metrics.stage("fetch_dest_digests", repo=repo_name):
+                        dst_tuples = fetch_issue_digests(dest_pool, DESTINATION_ORG, dst_repo)
+                    src_issues, dst_issues = set(src_tuples), set(dst_tuples)
+                else:
+                    with metrics.stage("fetch_source_issues", repo=repo_name):
+                        src_issues = fetch_issue_numbers(src_repo, lambda e: source_pool.report_error(src_gh, e))
+                    with metrics.stage("fetch_dest_issues", repo=repo_name):
+                        dst_issues = fetch_issue_numbers(dst_repo, lambda e: dest_pool.report_error(dst_gh, e))
+
+                diffs = compare_issues(src_issues, dst_issues)
+                metrics.incr("issues.missing", len(diffs["missing_in_dest"]), direction="missing_in_destination")
+                metrics.incr("issues.missing", len(diffs["missing_in_source"]), direction="missing_in_source")
+
+                for issue_num in diffs["missing_in_dest"]:
+                    report.write({
+                        "Repository": repo_name,
+                        "Direction": "missing_in_destination",
+                        "Missing Issue Number": issue_num
+                    })
+
+                for issue_num in diffs["missing_in_source"]:
+                    report.write({
+                        "Repository": repo_name,
+                        "Direction": "missing_in_source",
+                        "Missing Issue Number": issue_num
+                    })
+
+                if content_report is not None:
+                    with metrics.stage("content_compare", repo=repo_name):
+                        changed = write_content_mismatches(content_report, repo_name, src_tuples, dst_tuples, src_repo, dst_repo)
+                    metrics.incr("issues.content_mismatch", changed)
+                    if changed:
+                        logging.warning(f"{changed} issue field mismatch(es) in '{repo_name}'.")
+
+                if diffs["missing_in_dest"] or diffs["missing_in_source"]:
+                    logging.warning(f"Issue mismatch in '{repo_name}': "
+                                    f"{len(diffs['missing_in_dest'])} missing in destination, "
+                                    f"{len(diffs['missing_in_source'])} missing in source.")
+                else:
+                    logging.info(f"Issues match for '{repo_name}'.")
+
+        logging.info(f"Report complete: {report.rows_written} row(s) in {report.path}")
 
     except (RateLimitExceededException, RequestException) as e:
+        metrics.incr("api.errors", kind=type(e).__name__)
         logging.error(f"GitHub API error: {e}")
     except ValueError as e:
         logging.error(e)
@@ -160,4 +240,4 @@ def verify_org_issues() -> None:
 
 # --- Entry Point ---
 if __name__ == "__main__":
-    verify_org_issues()
+    metrics.run_main(verify_org_issues)
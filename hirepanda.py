@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the migration preflight scripts.
+
+    python hirepanda.py size            # size.py (use --quick for testSize.py)
+    python hirepanda.py disabled        # disable.py
+    python hirepanda.py tags            # test.py
+    python hirepanda.py issues          # hireME.py
+    python hirepanda.py largefile       # largefile400.py
+    python hirepanda.py binary          # Bin.py
+    python hirepanda.py wiki            # wikiCheck.py (use --api for wik.py)
+    python hirepanda.py static          # static.py
+    python hirepanda.py queue run binary --processes 4   # work_queue.py
+    python hirepanda.py startup-bench   # python -X importtime per subcommand
+
+Only the module behind the chosen subcommand is imported, so a quick run no longer
+pays for pandas, bs4 and PyGithub when it does not use them. Any remaining
+arguments (e.g. --profile) are passed through to the subcommand.
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import importlib
+from typing import Callable, Dict, List, Tuple
+
+# subcommand -> (module, entry function); modules are imported only when dispatched
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "size": ("size", "main"),
+    "size-quick": ("testSize", "main"),
+    "disabled": ("disable", "main"),
+    "tags": ("test", "verify_org_tags"),
+    "issues": ("hireME", "verify_org_issues"),
+    "largefile": ("largefile400", "main"),
+    "binary": ("Bin", "main"),
+    "wiki": ("wikiCheck", "main"),
+    "wiki-api": ("wik", "main"),
+    "static": ("static", "main"),
+    "queue": ("work_queue", "main"),
+}
+
+# Flags that pick an alternate implementation of a subcommand
+VARIANTS: Dict[Tuple[str, str], str] = {
+    ("size", "--quick"): "size-quick",
+    ("wiki", "--api"): "wiki-api",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def load_entry(command: str) -> Callable:
+    module_name, func_name = COMMANDS[command]
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+# --- Startup benchmark ---
+def _importtime(snippet: str) -> Tuple[Dict[str, int], float, bool]:
+    """Runs a snippet under -X importtime; returns top-level cumulative import us by module, wall ms, success."""
+    import subprocess
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", snippet], cwd=here, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    top_level: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) == 1:  # one space of indent = not a nested import
+            top_level[match.group(4)] = int(match.group(2))
+    return top_level, wall_ms, result.returncode == 0
+
+
+def startup_bench(commands: List[str]) -> None:
+    # Whatever the bare interpreter imports (site, encodings, ...) is not the subcommand's cost
+    baseline, baseline_ms, _ = _importtime("pass")
+    print(f"Interpreter baseline: {baseline_ms:.0f} ms wall\n")
+    print(f"{'subcommand':<12} {'import ms':>10} {'wall ms':>9}  heaviest top-level imports")
+    for command in commands:
+        module_name = COMMANDS[command][0]
+        imports, wall_ms, ok = _importtime(f"import importlib; importlib.import_module({module_name!r})")
+        own = {name: us for name, us in imports.items() if name not in baseline}
+        heaviest = sorted(own.items(), key=lambda item: item[1], reverse=True)[:5]
+        listing = ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in heaviest)
+        flag = "" if ok else "  (import failed)"
+        print(f"{command:<12} {sum(own.values()) / 1000:>10.1f} {wall_ms:>9.0f}  {listing}{flag}")
+
+
+def main(argv: List[str] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(description="Migration preflight checks", add_help=True)
+    parser.add_argument("command", choices=sorted(set(COMMANDS) | {"startup-bench"}))
+    args, rest = parser.parse_known_args(argv)
+
+    if args.command == "startup-bench":
+        startup_bench([c for c in rest if c in COMMANDS] or list(COMMANDS))
+        return
+
+    command = args.command
+    for flag in list(rest):
+        if (command, flag) in VARIANTS:
+            command = VARIANTS[(command, flag)]
+            rest.remove(flag)
+
+    import metrics
+
+    # argv[0] also names the default --profile output (<command>.prof)
+    sys.argv = [command] + rest
+    metrics.run_main(load_entry(command))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Bucketed content digests for comparing issues between two orgs.
+
+Each issue is reduced to a compact tuple
+    (number, state, title hash, body hash, comment count, updated_at)
+fetched 100 at a time over GraphQL; titles and bodies are hashed as each page
+arrives and never kept. Tuples are grouped into buckets of ISSUE_BUCKET_SIZE
+consecutive issue numbers and each bucket gets one digest. Only buckets whose
+digests differ are compared issue by issue, and only issues whose title or body
+differ are fetched in full, so the deep work grows with the number of
+differences rather than with the number of issues.
+
+ISSUE_DIGEST_IGNORE lists fields left out of the comparison. It defaults to
+updated_at, since the import rewrites timestamps; set it to "" to compare them.
+
+Pull requests are not included: GraphQL's issues connection never returns them,
+and hireME's numbers mode skips them too, so both modes compare the same set.
+"""
+
+import os
+import hashlib
+import logging
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from token_pool import TokenPool
+
+# --- Config ---
+ISSUE_BUCKET_SIZE: int = int(os.getenv("ISSUE_BUCKET_SIZE", "100"))
+ISSUE_DIGEST_IGNORE: List[str] = [f.strip() for f in os.getenv("ISSUE_DIGEST_IGNORE", "updated_at").split(",") if f.strip()]
+PAGE_SIZE: int = 100
+
+IssueTuple = namedtuple("IssueTuple", ["number", "state", "title_hash", "body_hash", "comments", "updated_at"])
+CONTENT_FIELDS: List[str] = ["state", "title_hash", "body_hash", "comments", "updated_at"]
+
+ISSUES_QUERY = """
+query($owner: String!, $name: String!, $first: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    issues(first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes { number state title body updatedAt comments { totalCount } }
+    }
+  }
+}
+"""
+
+
+def graphql_url(api_url: str) -> str:
+    """https://ghes/api/v3 -> https://ghes/api/graphql; https://api.github.com -> .../graphql"""
+    api_url = api_url.rstrip("/")
+    if api_url.endswith("/api/v3"):
+        return api_url[: -len("/v3")] + "/graphql"
+    return f"{api_url}/graphql"
+
+
+def _hash(text: Optional[str]) -> str:
+    return hashlib.sha1((text or "").encode()).hexdigest()[:16]
+
+
+def to_tuple(node: Dict) -> IssueTuple:
+    return IssueTuple(
+        number=node["number"],
+        state=(node.get("state") or "").lower(),
+        title_hash=_hash(node.get("title")),
+        body_hash=_hash(node.get("body")),
+        comments=(node.get("comments") or {}).get("totalCount", 0),
+        updated_at=node.get("updatedAt") or "",
+    )
+
+
+# --- Fetch ---
+def fetch_issue_tuples(pool: TokenPool, org: str, full_name: str) -> Dict[int, IssueTuple]:
+    """All issues of a repo (pull requests excluded) as compact tuples, keyed by number."""
+    owner, name = full_name.split("/", 1)
+    url = graphql_url(pool.base_url)
+    tuples: Dict[int, IssueTuple] = {}
+    after = None
+    while True:
+        response = pool.request(
+            "POST", url, org=org,
+            json={"query": ISSUES_QUERY, "variables": {"owner": owner, "name": name, "first": PAGE_SIZE, "after": after}},
+        )
+        response.raise_for_status()
+        payload = response.json()
+        repository = (payload.get("data") or {}).get("repository")
+        if payload.get("errors") or repository is None:
+            raise ValueError(f"GraphQL error for {full_name}: {payload.get('errors')}")
+        connection = repository["issues"]
+        for node in connection["nodes"]:
+            tuples[node["number"]] = to_tuple(node)
+        if not connection["pageInfo"]["hasNextPage"]:
+            break
+        after = connection["pageInfo"]["endCursor"]
+    metrics.incr("issues.digested", len(tuples))
+    return tuples
+
+
+# --- Compare ---
+def _key(issue: IssueTuple, ignore: Iterable[str]) -> Tuple:
+    return tuple(getattr(issue, field) for field in ["number"] + CONTENT_FIELDS if field not in ignore)
+
+
+def bucket_digests(
+    tuples: Dict[int, IssueTuple], bucket_size: int = ISSUE_BUCKET_SIZE, ignore: Iterable[str] = ISSUE_DIGEST_IGNORE
+) -> Dict[int, str]:
+    buckets: Dict = {}
+    for number in sorted(tuples):
+        bucket = buckets.setdefault(number // bucket_size, hashlib.sha256())
+        bucket.update(repr(_key(tuples[number], ignore)).encode())
+    return {bucket: digest.hexdigest() for bucket, digest in buckets.items()}
+
+
+def differing_buckets(src: Dict[int, str], dst: Dict[int, str]) -> List[int]:
+    return sorted(b for b in set(src) | set(dst) if src.get(b) != dst.get(b))
+
+
+def drill(
+    src: Dict[int, IssueTuple],
+    dst: Dict[int, IssueTuple],
+    buckets: List[int],
+    bucket_size: int = ISSUE_BUCKET_SIZE,
+    ignore: Iterable[str] = ISSUE_DIGEST_IGNORE,
+) -> List[Tuple[int, str]]:
+    """(issue number, field) for every field that differs in the given buckets; missing issues are skipped."""
+    mismatches: List[Tuple[int, str]] = []
+    for bucket in buckets:
+        for number in range(bucket * bucket_size, (bucket + 1) * bucket_size):
+            if number not in src or number not in dst:
+                continue
+            for field in CONTENT_FIELDS:
+                if field not in ignore and getattr(src[number], field) != getattr(dst[number], field):
+                    mismatches.append((number, field))
+    return mismatches
+
+
+def compare_content(
+    src: Dict[int, IssueTuple], dst: Dict[int, IssueTuple], bucket_size: int = ISSUE_BUCKET_SIZE
+) -> List[Tuple[int, str]]:
+    buckets = differing_buckets(bucket_digests(src, bucket_size), bucket_digests(dst, bucket_size))
+    metrics.incr("issues.buckets_differing", len(buckets))
+    if buckets:
+        logging.info(f"{len(buckets)} issue bucket(s) differ; drilling in")
+    return drill(src, dst, buckets, bucket_size)
+
+
+def describe(field: str, src: IssueTuple, dst: IssueTuple, fetch_full=None) -> Tuple[str, str]:
+    """
+    Human-readable source/destination values for a mismatch. Title and body only
+    exist as hashes in the tuple; fetch_full(side, number) -> issue supplies the text
+    (callers should cache it, as both fields may differ on the same issue).
+    """
+    if field in ("title_hash", "body_hash") and fetch_full:
+        attr = "title" if field == "title_hash" else "body"
+        src_text = getattr(fetch_full("source", src.number), attr) or ""
+        dst_text = getattr(fetch_full("destination", dst.number), attr) or ""
+        if attr == "title":
+            return src_text, dst_text
+        return f"{len(src_text)} chars", f"{len(dst_text)} chars"
+    return str(getattr(src, field)), str(getattr(dst, field))
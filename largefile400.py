@@ -1,17 +1,27 @@
-import csv
 import os
 import subprocess
 import tempfile
 import shutil
+import time
 from dotenv import load_dotenv
+import metrics
+from candidate_queue import connect_candidates, prefetch
+from report_sink import REPORT_BATCH_SIZE, ReportWriter, report_path
+from scan_cache import cached_scan
+from url_input import read_url_column, unique
 
 # Load .env variables
 load_dotenv()
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
 INPUT_CSV = 'urlTestGreater.csv'
+# csv: read INPUT_CSV in file order; mongo: stream straight from the metadata store (see candidate_queue.py)
+CANDIDATE_SOURCE = os.getenv("CANDIDATE_SOURCE", "csv")
 OUTPUT_CSV = 'repo_large_file_report.csv'
+REPORT_FIELDS = ['repo_url', 'has_large_file']
 SIZE_THRESHOLD_BYTES = 400 * 1024 * 1024  # 400MB
+# Bump when the scan logic changes so cached results are not reused
+CHECK_VERSION = f"1:{SIZE_THRESHOLD_BYTES}"
 
 
 def format_url_with_token(repo_url):
@@ -25,46 +35,79 @@ def format_url_with_token(repo_url):
 
 def clone_repo(repo_url, destination):
     """Clone the repo to a temp folder using the token if needed."""
+    start = time.perf_counter()
     try:
         secure_url = format_url_with_token(repo_url)
         subprocess.run(['git', 'clone', '--depth=1', secure_url, destination], check=True, capture_output=True)
+        metrics.record_clone(destination, time.perf_counter() - start, check="largefile", repo=repo_url)
         return True
     except subprocess.CalledProcessError as e:
+        metrics.record_clone(destination, time.perf_counter() - start, ok=False, check="largefile", repo=repo_url)
         print(f"[ERROR] Cloning failed: {repo_url} — {e}")
         return False
 
 
 def has_file_over_threshold(path):
     """Walk the repo and check if any file is over 400MB."""
-    for root, _, files in os.walk(path):
-        for f in files:
-            try:
-                size = os.path.getsize(os.path.join(root, f))
-                if size > SIZE_THRESHOLD_BYTES:
-                    return True
-            except Exception:
-                continue
-    return False
+    start = time.perf_counter()
+    files_seen = 0
+    try:
+        for root, _, files in os.walk(path):
+            for f in files:
+                files_seen += 1
+                try:
+                    size = os.path.getsize(os.path.join(root, f))
+                    if size > SIZE_THRESHOLD_BYTES:
+                        return True
+                except Exception:
+                    continue
+        return False
+    finally:
+        metrics.record_scan(files_seen, time.perf_counter() - start, check="largefile")
 
 
-def main():
-    with open(INPUT_CSV, newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        urls = [row[0].strip() for row in reader if row]
+def iter_candidates():
+    """Candidate URLs streamed from the chosen source, each repo once however it is spelled."""
+    if CANDIDATE_SOURCE == "mongo":
+        return unique(connect_candidates(), label="mongo candidates")
+    return unique(read_url_column(INPUT_CSV), label=INPUT_CSV)
+
+
+def scan_repo(url):
+    """Clone and scan one repo; returns True/False, or 'CLONE_FAILED'."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if clone_repo(url, tmpdir):
+            return has_file_over_threshold(tmpdir)
+        return 'CLONE_FAILED'
 
-    with open(OUTPUT_CSV, mode='w', newline='') as outcsv:
-        writer = csv.writer(outcsv)
-        writer.writerow(['repo_url', 'has_large_file'])
 
-        for url in urls:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                print(f"[INFO] Checking {url}")
-                if clone_repo(url, tmpdir):
-                    large_file_found = has_file_over_threshold(tmpdir)
-                    writer.writerow([url, large_file_found])
-                else:
-                    writer.writerow([url, 'CLONE_FAILED'])
+def iter_tasks():
+    """Work-queue seed: one task per candidate."""
+    for url in iter_candidates():
+        yield {'url': url}
+
+
+def check_url(url):
+    print(f"[INFO] Checking {url}")
+    with metrics.stage("repo_total", check="largefile", repo=url):
+        result = cached_scan(
+            url, "largefile", CHECK_VERSION, lambda: scan_repo(url),
+            remote_url=format_url_with_token(url),
+            cacheable=lambda r: r != 'CLONE_FAILED',
+        )
+    return {'repo_url': url, 'has_large_file': result}
+
+
+def main():
+    output = report_path(OUTPUT_CSV)
+    # CSV: each result reaches <report>.part as soon as its clone is scanned.
+    # Parquet keeps the normal batch size, since every flush is a row group.
+    batch_size = 1 if output.endswith(".csv") else REPORT_BATCH_SIZE
+    with ReportWriter(output, REPORT_FIELDS, batch_size=batch_size) as report:
+        # Candidates are read ahead on a background thread, so scanning starts with the first one
+        for url in prefetch(iter_candidates()):
+            report.write(check_url(url))
 
 
 if __name__ == "__main__":
-    main()
+    metrics.run_main(main)
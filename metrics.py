@@ -0,0 +1,270 @@
+"""
+Hot-path instrumentation shared by all scripts.
+
+Records API latency, retries and throttle waits, clone bytes/duration, scan rates
+and per-repo stage timings, and exports them through a pluggable sink:
+
+    METRICS_SINK=statsd  -> DogStatsD over UDP (STATSD_HOST / STATSD_PORT), for Datadog
+    METRICS_SINK=jsonl   -> one JSON object per line in METRICS_FILE
+    METRICS_SINK=none    -> disabled (default)
+
+Run any script with --profile [PATH] to also write cProfile output for the run.
+"""
+
+import os
+import sys
+import time
+import atexit
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+# Heavier stdlib modules (socket, json, argparse, threading) are imported where used,
+# since every script imports this module at startup.
+
+# --- Config ---
+METRICS_SINK: str = os.getenv("METRICS_SINK", "none").lower()
+METRICS_PREFIX: str = os.getenv("METRICS_PREFIX", "hirepanda")
+METRICS_FILE: str = os.getenv("METRICS_FILE", "metrics.jsonl")
+STATSD_HOST: str = os.getenv("STATSD_HOST", "127.0.0.1")
+STATSD_PORT: int = int(os.getenv("STATSD_PORT", "8125"))
+
+# Tags that are useful in a local JSONL file but would explode Datadog cardinality
+HIGH_CARDINALITY_TAGS = {"repo", "url", "org"}
+
+
+# --- Sinks ---
+class NullSink:
+    def emit(self, name: str, kind: str, value: float, tags: Dict[str, str]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class StatsdSink:
+    """DogStatsD line protocol: <name>:<value>|<type>|#k:v,k:v"""
+
+    TYPES = {"counter": "c", "timing": "ms", "histogram": "h", "gauge": "g"}
+
+    def __init__(self, host: str, port: int, prefix: str) -> None:
+        import socket
+
+        self.addr = (host, port)
+        self.prefix = prefix
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def emit(self, name: str, kind: str, value: float, tags: Dict[str, str]) -> None:
+        line = f"{self.prefix}.{name}:{value:g}|{self.TYPES[kind]}"
+        tag_str = ",".join(f"{k}:{v}" for k, v in tags.items() if k not in HIGH_CARDINALITY_TAGS)
+        if tag_str:
+            line += f"|#{tag_str}"
+        try:
+            self.sock.sendto(line.encode(), self.addr)
+        except OSError:
+            pass  # metrics must never break a sweep
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class JsonLinesSink:
+    def __init__(self, path: str, prefix: str) -> None:
+        import threading
+
+        self.prefix = prefix
+        self.file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def emit(self, name: str, kind: str, value: float, tags: Dict[str, str]) -> None:
+        import json
+
+        record = {"ts": time.time(), "metric": f"{self.prefix}.{name}", "type": kind, "value": value, "tags": tags}
+        with self._lock:
+            self.file.write(json.dumps(record) + "\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+_sink = None
+
+
+def get_sink():
+    global _sink
+    if _sink is None:
+        if METRICS_SINK == "statsd":
+            _sink = StatsdSink(STATSD_HOST, STATSD_PORT, METRICS_PREFIX)
+        elif METRICS_SINK == "jsonl":
+            _sink = JsonLinesSink(METRICS_FILE, METRICS_PREFIX)
+        else:
+            _sink = NullSink()
+        atexit.register(close)
+    return _sink
+
+
+def set_sink(sink) -> None:
+    global _sink
+    _sink = sink
+
+
+def close() -> None:
+    """Flushes and detaches the sink; anything emitted afterwards is dropped."""
+    global _sink
+    if _sink is not None:
+        _sink.close()
+        _sink = NullSink()
+
+
+def enabled() -> bool:
+    return not isinstance(get_sink(), NullSink)
+
+
+# --- Primitives ---
+def _tags(tags: Dict) -> Dict[str, str]:
+    return {k: str(v) for k, v in tags.items() if v is not None}
+
+
+def incr(name: str, value: float = 1, **tags) -> None:
+    get_sink().emit(name, "counter", value, _tags(tags))
+
+
+def gauge(name: str, value: float, **tags) -> None:
+    get_sink().emit(name, "gauge", value, _tags(tags))
+
+
+def histogram(name: str, value: float, **tags) -> None:
+    get_sink().emit(name, "histogram", value, _tags(tags))
+
+
+def timing(name: str, ms: float, **tags) -> None:
+    get_sink().emit(name, "timing", ms, _tags(tags))
+
+
+@contextmanager
+def timer(name: str, **tags) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing(name, (time.perf_counter() - start) * 1000, **tags)
+
+
+def stage(stage_name: str, **tags):
+    """Times one stage of a repo's processing (api, clone, scan, csv_write, ...)."""
+    return timer("stage.duration", stage=stage_name, **tags)
+
+
+# --- HTTP ---
+def http_request(method: str, url: str, session=None, **kwargs):
+    """requests call that records latency, status and throttling."""
+    import requests
+
+    sender = session or requests
+    start = time.perf_counter()
+    response = sender.request(method, url, **kwargs)
+    record_response(method, url, response.status_code, response.headers, (time.perf_counter() - start) * 1000)
+    return response
+
+
+def record_response(method: str, url: str, status: int, headers, elapsed_ms: float) -> None:
+    host = urlparse(url).hostname
+    histogram("api.latency", elapsed_ms, host=host, method=method, status=status)
+    incr("api.requests", host=host, status=status)
+    if status in (403, 429) and headers.get("X-RateLimit-Remaining") == "0":
+        incr("api.throttled", host=host)
+
+
+def http_get(url: str, **kwargs):
+    return http_request("GET", url, **kwargs)
+
+
+def _record_pygithub_response(response, *args, **kwargs) -> None:
+    record_response(
+        response.request.method, response.url, response.status_code, response.headers,
+        response.elapsed.total_seconds() * 1000,
+    )
+    # PyGithub retries (including rate-limit backoff) inside urllib3; the final response carries the history
+    retries = getattr(getattr(response.raw, "retries", None), "history", ())
+    if retries:
+        incr("api.retries", len(retries), host=urlparse(response.url).hostname)
+
+
+def instrument_pygithub() -> None:
+    """
+    Adds a response hook to the requests session behind every PyGithub connection,
+    so PyGithub calls are recorded like http_request ones. Safe to call repeatedly.
+    """
+    from github import Requester
+
+    for cls in (Requester.HTTPRequestsConnectionClass, Requester.HTTPSRequestsConnectionClass):
+        if getattr(cls, "_metrics_instrumented", False):
+            continue
+        original_init = cls.__init__
+
+        def __init__(self, *args, _original_init=original_init, **kwargs):
+            _original_init(self, *args, **kwargs)
+            self.session.hooks["response"].append(_record_pygithub_response)
+
+        cls.__init__ = __init__
+        cls._metrics_instrumented = True
+
+
+# --- Clone / scan ---
+def dir_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                continue
+    return total
+
+
+def record_clone(path: str, seconds: float, ok: bool = True, **tags) -> None:
+    timing("clone.duration", seconds * 1000, ok=ok, **tags)
+    # Sizing the clone costs an extra walk, so only do it when someone is listening
+    if ok and enabled():
+        histogram("clone.bytes", dir_bytes(path), **tags)
+
+
+def record_scan(files: int, seconds: float, **tags) -> None:
+    incr("scan.files", files, **tags)
+    timing("scan.duration", seconds * 1000, **tags)
+    if seconds > 0:
+        gauge("scan.files_per_second", files / seconds, **tags)
+
+
+# --- Entry point ---
+def run_main(main: Callable[[], Optional[object]], argv: Optional[list] = None):
+    """
+    Runs a script's main(), honouring --profile [PATH] (default: <script>.prof).
+    Unrecognised arguments are left in sys.argv for the script itself.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", nargs="?", const="", default=None)
+    args, rest = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    sys.argv = sys.argv[:1] + rest
+
+    start = time.perf_counter()
+    try:
+        if args.profile is None:
+            return main()
+
+        import cProfile
+        import pstats
+
+        profile_path = args.profile or f"{os.path.splitext(os.path.basename(sys.argv[0]))[0]}.prof"
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(main)
+        finally:
+            profiler.dump_stats(profile_path)
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(20)
+            print(f"cProfile output written to {profile_path}", file=sys.stderr)
+    finally:
+        timing("run.duration", (time.perf_counter() - start) * 1000, script=os.path.basename(sys.argv[0]))
+        close()
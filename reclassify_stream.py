@@ -0,0 +1,335 @@
+"""
+Incremental org reclassification driven by repo changes.
+
+agg.txt / complexity_eval.py recompute every complex org from scratch. This keeps
+a materialized rollup instead: for every org, how many complex repos set each
+complexity factor. A repo change only touches its own org's counters, and the
+org's final_classification is rewritten only when the hard-stop verdict flips.
+
+Changes come from a MongoDB change stream on the repositories collection (needs
+a replica set). Where change streams aren't available it falls back to polling
+the UPDATED_AT_FIELD index; polling cannot see deletes, so run with --rebuild
+now and then in that mode.
+
+State lives next to the data so the watcher can be restarted at any point:
+  ghes_repo_flag_state   per repo: owner and the factors it currently contributes.
+                         A repo's new state is written marked dirty before its
+                         org counters move and the mark is cleared after, so on
+                         restart the counters of any org with a dirty repo are
+                         recomputed from the state (recover()) before replaying.
+  ghes_org_flag_rollup   per org: factor counts and final_classification
+  ghes_reclassify_cursor change-stream resume token / polling watermark
+
+Local test setup (single-node replica set):
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGO_URI='mongodb://localhost:27017/?replicaSet=rs0&directConnection=true' python reclassify_stream.py --rebuild
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from typing import Dict, Optional, Set
+
+import metrics
+from complexity_eval import ALL_FIELDS, HARD_STOP_FIELDS, MEDIUM, ORG_COLLECTION, REPO_COLLECTION, STILL_COMPLEX
+from report_sink import ReportWriter, report_path
+
+# --- Config ---
+MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME: str = os.getenv("MONGO_DB", "your_database_name")
+STATE_COLLECTION: str = "ghes_repo_flag_state"
+ROLLUP_COLLECTION: str = "ghes_org_flag_rollup"
+CURSOR_COLLECTION: str = "ghes_reclassify_cursor"
+UPDATED_AT_FIELD: str = os.getenv("MONGO_UPDATED_AT_FIELD", "updated_at")
+POLL_INTERVAL_SECONDS: float = float(os.getenv("RECLASSIFY_POLL_SECONDS", "30"))
+CSV_OUTPUT_PATH: str = os.getenv("CSV_OUTPUT_PATH", "reclassified_orgs.csv")
+
+CURSOR_ID = "repos"
+# ChangeStreamHistoryLost, ChangeStreamFatalError
+RESUME_TOKEN_LOST_CODES = (286, 280)
+
+
+def repo_flags(doc: Optional[dict]) -> Set[str]:
+    """Factors a repo contributes to its org; only complex repos count, as in agg.txt."""
+    if not doc or doc.get("complexity_score") != "Complex":
+        return set()
+    factors = doc.get("complexity_factors") or {}
+    return {field for field in ALL_FIELDS if factors.get(field) == "Complex"}
+
+
+def classification_for(counts: Dict[str, int]) -> str:
+    return STILL_COMPLEX if any(counts.get(field, 0) > 0 for field in HARD_STOP_FIELDS) else MEDIUM
+
+
+class OrgRollup:
+    def __init__(self, db) -> None:
+        self.repos_col = db[REPO_COLLECTION]
+        self.orgs_col = db[ORG_COLLECTION]
+        self.state_col = db[STATE_COLLECTION]
+        self.rollup_col = db[ROLLUP_COLLECTION]
+        self.cursor_col = db[CURSOR_COLLECTION]
+
+    # --- Full rebuild ---
+    def rebuild(self) -> int:
+        """One pass over every repo to seed the state and rollup collections."""
+        resume_token = self._stream_position()
+        counts: Dict[str, Dict[str, int]] = {}
+        self.state_col.delete_many({})
+        self.rollup_col.delete_many({})
+        watermark = None
+        states = []
+        projection = {"owner_name": 1, "complexity_score": 1, "complexity_factors": 1, UPDATED_AT_FIELD: 1}
+        for doc in self.repos_col.find({}, projection=projection):
+            updated_at = doc.get(UPDATED_AT_FIELD)
+            if updated_at is not None and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+            owner, flags = doc.get("owner_name"), repo_flags(doc)
+            if not owner:
+                continue
+            org_counts = counts.setdefault(owner, {field: 0 for field in ALL_FIELDS})
+            for field in flags:
+                org_counts[field] += 1
+            states.append({"_id": doc["_id"], "owner_name": owner, "flags": sorted(flags)})
+        if states:
+            self.state_col.insert_many(states)
+        for org_name, org_counts in counts.items():
+            self.rollup_col.insert_one({
+                "_id": org_name, "counts": org_counts, "final_classification": classification_for(org_counts),
+            })
+            self._publish(org_name, org_counts)
+        # Both positions were taken before the scan, so changes made during it are replayed (apply is idempotent)
+        self.cursor_col.replace_one(
+            {"_id": CURSOR_ID}, {"_id": CURSOR_ID, "resume_token": resume_token, "watermark": watermark}, upsert=True,
+        )
+        logging.info(f"Rollup rebuilt: {len(states)} repo(s) across {len(counts)} org(s)")
+        return len(counts)
+
+    # --- Incremental update ---
+    def apply(self, repo_id, doc: Optional[dict]) -> Optional[str]:
+        """
+        Applies one repo's current document (None when deleted). Returns the org's
+        new classification if it changed, otherwise None.
+        """
+        previous = self.state_col.find_one({"_id": repo_id}) or {}
+        old_owner, old_flags = previous.get("owner_name"), set(previous.get("flags", []))
+        new_owner, new_flags = (doc or {}).get("owner_name"), repo_flags(doc)
+        if old_owner == new_owner and old_flags == new_flags:
+            return None
+
+        # Marked dirty until the counters below are bumped; see recover()
+        self.state_col.replace_one(
+            {"_id": repo_id},
+            {"_id": repo_id, "owner_name": new_owner or None, "flags": sorted(new_flags), "dirty": True,
+             "previous_owner": old_owner},
+            upsert=True,
+        )
+
+        changed = None
+        deltas: Dict[str, Dict[str, int]] = {}
+        if old_owner:
+            for field in old_flags:
+                deltas.setdefault(old_owner, {}).setdefault(field, 0)
+                deltas[old_owner][field] -= 1
+        if new_owner:
+            for field in new_flags:
+                deltas.setdefault(new_owner, {}).setdefault(field, 0)
+                deltas[new_owner][field] += 1
+        for org_name, delta in deltas.items():
+            delta = {field: n for field, n in delta.items() if n}
+            if delta:
+                result = self._bump(org_name, delta)
+                if result:
+                    changed = result
+        self._settle(repo_id, new_owner)
+        return changed
+
+    def _settle(self, repo_id, owner: Optional[str]) -> None:
+        if owner:
+            self.state_col.update_one({"_id": repo_id}, {"$unset": {"dirty": "", "previous_owner": ""}})
+        else:
+            self.state_col.delete_one({"_id": repo_id})
+
+    def recover(self) -> int:
+        """
+        Recomputes the counters of every org touched by an apply() that was cut
+        short (state written, counters maybe not), then clears the marks. Returns
+        the number of orgs recomputed.
+        """
+        dirty = list(self.state_col.find({"dirty": True}))
+        orgs = {org for doc in dirty for org in (doc.get("owner_name"), doc.get("previous_owner")) if org}
+        for org_name in orgs:
+            counts = {field: 0 for field in ALL_FIELDS}
+            for state in self.state_col.find({"owner_name": org_name}, projection={"flags": 1}):
+                for field in state.get("flags", []):
+                    counts[field] += 1
+            classification = classification_for(counts)
+            previous = self.rollup_col.find_one({"_id": org_name}) or {}
+            self.rollup_col.replace_one(
+                {"_id": org_name}, {"_id": org_name, "counts": counts, "final_classification": classification}, upsert=True,
+            )
+            if classification != previous.get("final_classification"):
+                metrics.incr("reclassify.flips", classification=classification)
+                logging.info(f"{org_name}: reclassified as {classification}")
+            self._publish(org_name, counts)
+        for doc in dirty:
+            self._settle(doc["_id"], doc.get("owner_name"))
+        if orgs:
+            logging.warning(f"Recovered {len(orgs)} org rollup(s) from an interrupted update")
+        return len(orgs)
+
+    def _bump(self, org_name: str, delta: Dict[str, int]) -> Optional[str]:
+        rollup = self.rollup_col.find_one_and_update(
+            {"_id": org_name},
+            {"$inc": {f"counts.{field}": n for field, n in delta.items()}},
+            upsert=True,
+            return_document=True,  # ReturnDocument.AFTER
+        )
+        counts = rollup.get("counts", {})
+        classification = classification_for(counts)
+        metrics.incr("reclassify.org_updates")
+        # A flag flips when its count crosses zero
+        flag_changed = any((counts.get(field, 0) > 0) != (counts.get(field, 0) - n > 0) for field, n in delta.items())
+        flipped = classification != rollup.get("final_classification")
+        if flipped:
+            self.rollup_col.update_one({"_id": org_name}, {"$set": {"final_classification": classification}})
+            metrics.incr("reclassify.flips", classification=classification)
+            logging.info(f"{org_name}: reclassified as {classification}")
+        if flipped or flag_changed:
+            self._publish(org_name, counts)
+        return classification if flipped else None
+
+    def _publish(self, org_name: str, counts: Dict[str, int]) -> None:
+        """Writes the org's flags and final_classification back onto its (complex) org document."""
+        self.orgs_col.update_one(
+            {"org_name": org_name, "complexity_score": "Complex"},
+            {"$set": {
+                **{f"reclassified_flags.{field}": "Complex" if counts.get(field, 0) > 0 else "Simple" for field in ALL_FIELDS},
+                "final_classification": classification_for(counts),
+            }},
+        )
+
+    # --- Change sources ---
+    def _cursor(self) -> dict:
+        return self.cursor_col.find_one({"_id": CURSOR_ID}) or {}
+
+    def _stream_position(self):
+        """Resume token for "now", or None when the server has no change streams."""
+        try:
+            with self.repos_col.watch() as stream:
+                return stream.resume_token
+        except Exception as e:  # standalone server, mongomock, missing privileges
+            logging.debug(f"No change stream position: {e}")
+            return None
+
+    def watch(self, max_events: Optional[int] = None) -> int:
+        """Follows the repositories change stream; raises if the server can't provide one."""
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        applied = 0
+        with self.repos_col.watch(
+            pipeline, full_document="updateLookup", resume_after=self._cursor().get("resume_token"),
+        ) as stream:
+            logging.info("Watching repository changes")
+            for change in stream:
+                repo_id = change["documentKey"]["_id"]
+                doc = None if change["operationType"] == "delete" else change.get("fullDocument")
+                self.apply(repo_id, doc)
+                self.cursor_col.update_one(
+                    {"_id": CURSOR_ID}, {"$set": {"resume_token": stream.resume_token}}, upsert=True,
+                )
+                applied += 1
+                if max_events and applied >= max_events:
+                    break
+        return applied
+
+    def poll_once(self) -> int:
+        """Applies every repo updated at or after the stored watermark ($gte: ties are re-applied, not lost)."""
+        watermark = self._cursor().get("watermark")
+        query = {UPDATED_AT_FIELD: {"$gte": watermark}} if watermark is not None else {}
+        applied = 0
+        for doc in self.repos_col.find(query).sort(UPDATED_AT_FIELD, 1):
+            self.apply(doc["_id"], doc)
+            watermark = doc.get(UPDATED_AT_FIELD, watermark)
+            applied += 1
+        if applied:
+            self.cursor_col.update_one({"_id": CURSOR_ID}, {"$set": {"watermark": watermark}}, upsert=True)
+        return applied
+
+    def poll(self, interval: float = POLL_INTERVAL_SECONDS) -> None:
+        logging.info(f"Polling {REPO_COLLECTION}.{UPDATED_AT_FIELD} every {interval:g}s")
+        self.repos_col.create_index(UPDATED_AT_FIELD)
+        while True:
+            applied = self.poll_once()
+            logging.debug(f"Poll applied {applied} repo document(s)")
+            time.sleep(interval)
+
+    # --- Export ---
+    def export_csv(self, path: str) -> int:
+        """Same columns as reclassified_orgs.csv, for the complex orgs only."""
+        output = report_path(path)
+        fieldnames = ["org_name", "org_url"] + ALL_FIELDS + ["final_classification"]
+        with ReportWriter(output, fieldnames) as report:
+            for org in self.orgs_col.find({"complexity_score": "Complex"}, projection={"org_name": 1, "org_url": 1}):
+                rollup = self.rollup_col.find_one({"_id": org.get("org_name")}) or {}
+                counts = rollup.get("counts", {})
+                report.write({
+                    "org_name": org.get("org_name"),
+                    "org_url": org.get("org_url", ""),
+                    **{field: "Complex" if counts.get(field, 0) > 0 else "Simple" for field in ALL_FIELDS},
+                    "final_classification": classification_for(counts),
+                })
+        print(f"✅ CSV written: {output}")
+        return report.rows_written
+
+
+def follow(rollup: OrgRollup, mode: str) -> None:
+    rollup.recover()
+    if mode in ("auto", "watch"):
+        from pymongo.errors import OperationFailure
+
+        try:
+            try:
+                rollup.watch()
+            except OperationFailure as e:
+                if e.code not in RESUME_TOKEN_LOST_CODES:
+                    raise
+                # The oplog rolled past the stored token: changes were missed, so start over from a fresh scan
+                logging.warning(f"Change stream resume token is no longer valid ({e}); rebuilding the rollup")
+                rollup.rebuild()
+                rollup.watch()
+            return
+        # OperationFailure: standalone server; TypeError/NotImplementedError: mongomock has no watch()
+        except (OperationFailure, NotImplementedError, TypeError) as e:
+            if mode == "watch":
+                raise
+            logging.warning(f"Change streams unavailable ({e}); falling back to polling {UPDATED_AT_FIELD}")
+    rollup.poll()
+
+
+def main() -> None:
+    from pymongo import MongoClient
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Incrementally reclassify orgs as repo documents change")
+    parser.add_argument("--mode", choices=["auto", "watch", "poll"], default="auto")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the rollup from every repo first")
+    parser.add_argument("--export", action="store_true", help="write CSV_OUTPUT_PATH from the rollup and exit")
+    args = parser.parse_args()
+
+    rollup = OrgRollup(MongoClient(MONGO_URI)[DB_NAME])
+    if args.rebuild or rollup.rollup_col.find_one() is None:
+        with metrics.stage("rollup_rebuild"):
+            rollup.rebuild()
+    if args.export:
+        rollup.export_csv(CSV_OUTPUT_PATH)
+        return
+    try:
+        follow(rollup, args.mode)
+    except KeyboardInterrupt:
+        print("Stopped.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    metrics.run_main(main)
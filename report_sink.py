@@ -0,0 +1,250 @@
+"""
+Shared streaming report writer, plus cross-run merge and query.
+
+Scripts write rows as they are produced; rows are flushed in batches of
+REPORT_BATCH_SIZE to "<report>.part", which is renamed over the final path only
+when the run finishes (an interrupted run never leaves a half-written report
+behind the real name). REPORT_FORMAT=parquet writes Parquet instead of CSV
+(needs pyarrow); all columns are stored as strings so reports from different
+runs always merge.
+
+    python report_sink.py merge -o all_orgs.parquet reports/*.csv
+    python report_sink.py query reports/*.csv --where Direction=missing_in_destination --group-by Repository
+"""
+
+import os
+import re
+import csv
+import sys
+import glob
+import argparse
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# --- Config ---
+REPORT_FORMAT: str = os.getenv("REPORT_FORMAT", "csv").lower()
+REPORT_BATCH_SIZE: int = int(os.getenv("REPORT_BATCH_SIZE", "1000"))
+
+FORMATS = ("csv", "parquet")
+
+
+def report_path(path: str, fmt: str = REPORT_FORMAT) -> str:
+    """Swaps the extension of a script's default output name to match the report format."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{fmt}" if ext.lstrip(".") in FORMATS else path
+
+
+def _format_of(path: str) -> str:
+    return "parquet" if path.endswith(".parquet") else "csv"
+
+
+class ReportWriter:
+    def __init__(self, path: str, fieldnames: List[str], batch_size: int = REPORT_BATCH_SIZE) -> None:
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.batch_size = batch_size
+        self.format = _format_of(path)
+        self.tmp_path = f"{path}.part"
+        self.rows_written = 0
+        self._batch: List[Dict[str, str]] = []
+        self._closed = False
+
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self._pa = pa
+            self._schema = pa.schema([(name, pa.string()) for name in self.fieldnames])
+            self._writer = pq.ParquetWriter(self.tmp_path, self._schema)
+        else:
+            self._file = open(self.tmp_path, "w", newline="")
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+            self._writer.writeheader()
+
+    def write(self, row: Dict) -> None:
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, rows: Iterable[Dict]) -> None:
+        for row in rows:
+            self.write(row)
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        if self.format == "parquet":
+            columns = {
+                name: [None if row.get(name) is None else str(row.get(name)) for row in self._batch]
+                for name in self.fieldnames
+            }
+            self._writer.write_table(self._pa.table(columns, schema=self._schema))
+        else:
+            self._writer.writerows(self._batch)
+            self._file.flush()
+        self.rows_written += len(self._batch)
+        self._batch = []
+
+    def close(self) -> None:
+        """Flushes the last batch and atomically moves the report into place."""
+        if self._closed:
+            return
+        self.flush()
+        if self.format == "parquet":
+            self._writer.close()
+        else:
+            self._file.close()
+        os.replace(self.tmp_path, self.path)
+        self._closed = True
+
+    def abort(self) -> None:
+        """Stops writing but leaves <report>.part in place so a failed run can be inspected."""
+        if self._closed:
+            return
+        self.flush()
+        if self.format == "parquet":
+            self._writer.close()
+        else:
+            self._file.close()
+        self._closed = True
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# --- Reading ---
+def read_fieldnames(path: str) -> List[str]:
+    if _format_of(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).schema_arrow.names
+    with open(path, newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def iter_rows(path: str, batch_size: int = REPORT_BATCH_SIZE) -> Iterator[Dict[str, str]]:
+    """Streams rows from a CSV or Parquet report without loading the whole file."""
+    if _format_of(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    else:
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    paths: List[str] = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches or [pattern])
+    return paths
+
+
+# --- Merge ---
+def union_fieldnames(inputs: List[str]) -> List[str]:
+    """Every column of every input, in first-seen order."""
+    fieldnames: List[str] = []
+    for path in inputs:
+        for name in read_fieldnames(path):
+            if name not in fieldnames:
+                fieldnames.append(name)
+    return fieldnames
+
+
+def merge_reports(inputs: List[str], output: str, source_column: str = "source_report") -> int:
+    """Concatenates reports from many runs into one, tagging each row with the file it came from."""
+    fieldnames = union_fieldnames(inputs)
+    writer = ReportWriter(output, fieldnames + [source_column])
+    with writer:
+        for path in inputs:
+            source = os.path.basename(path)
+            for row in iter_rows(path):
+                writer.write({**row, source_column: source})
+    return writer.rows_written
+
+
+# --- Query ---
+FILTER = re.compile(r"^(.*?)(!=|~|=)(.*)$", re.DOTALL)
+
+
+def parse_filter(expression: str):
+    """Splits on the first operator, so values may contain '=' or '~' (col=a~b)."""
+    match = FILTER.match(expression)
+    if match:
+        column, op, value = match.groups()
+        return column.strip(), op, value.strip()
+    raise ValueError(f"Bad filter '{expression}' (use col=value, col!=value or col~substring)")
+
+
+def matches(row: Dict[str, str], filters) -> bool:
+    for column, op, value in filters:
+        cell = "" if row.get(column) is None else str(row.get(column))
+        if op == "=" and cell != value:
+            return False
+        if op == "!=" and cell == value:
+            return False
+        if op == "~" and value.lower() not in cell.lower():
+            return False
+    return True
+
+
+def query(inputs: List[str], where: List[str], group_by: List[str], limit: Optional[int] = None) -> None:
+    filters = [parse_filter(expression) for expression in where]
+    counts: Counter = Counter()
+    shown = 0
+    writer = None
+    for path in inputs:
+        for row in iter_rows(path):
+            if not matches(row, filters):
+                continue
+            if group_by:
+                counts[tuple(row.get(column, "") for column in group_by)] += 1
+                continue
+            if writer is None:
+                # Columns that only appear in later reports are kept too
+                writer = csv.DictWriter(sys.stdout, fieldnames=union_fieldnames(inputs), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow(row)
+            shown += 1
+            if limit and shown >= limit:
+                return
+    if group_by:
+        out = csv.writer(sys.stdout)
+        out.writerow(group_by + ["count"])
+        for key, count in counts.most_common(limit):
+            out.writerow(list(key) + [count])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Merge and query report files across runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    merge = sub.add_parser("merge", help="combine reports from many runs into one dataset")
+    merge.add_argument("inputs", nargs="+")
+    merge.add_argument("-o", "--output", required=True)
+
+    q = sub.add_parser("query", help="filter / count rows across reports")
+    q.add_argument("inputs", nargs="+")
+    q.add_argument("--where", action="append", default=[], help="col=value, col!=value or col~substring")
+    q.add_argument("--group-by", action="append", default=[])
+    q.add_argument("--limit", type=int)
+
+    args = parser.parse_args()
+    inputs = expand_inputs(args.inputs)
+    if args.command == "merge":
+        count = merge_reports(inputs, args.output)
+        print(f"✅ Merged {count} row(s) from {len(inputs)} report(s) into {args.output}", file=sys.stderr)
+    else:
+        query(inputs, args.where, args.group_by, args.limit)
+
+
+if __name__ == "__main__":
+    main()
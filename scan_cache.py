@@ -0,0 +1,178 @@
+"""
+Memoizes per-repo scan results keyed on the repo's ref state.
+
+Before cloning or crawling a repo, one `git ls-remote` gives a digest of every
+ref -> sha. Results are stored under (repo, check name, check version, digest),
+so an unchanged repo is answered from the store without any clone. Bump a
+script's CHECK_VERSION whenever its scan logic or thresholds change.
+
+Repos are stored under their canonical host/org/repo key (url_input.canonical_key),
+so tokens embedded in input URLs never reach the store. Eviction runs when the
+cache opens and again every EVICT_EVERY inserts, so a long run stays bounded.
+
+SCAN_CACHE=off           disable the cache
+SCAN_CACHE_DB            SQLite file (default scan_cache.sqlite)
+SCAN_CACHE_MAX_AGE_DAYS  entries older than this are evicted (default 30)
+SCAN_CACHE_MAX_ENTRIES   only the newest N entries are kept (default 200000)
+SCAN_CACHE_EVICT_EVERY   inserts between evictions during a run (default 1000)
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+import subprocess
+from typing import Any, Callable, Optional
+
+import metrics
+from url_input import canonical_key
+
+# --- Config ---
+SCAN_CACHE_ENABLED: bool = os.getenv("SCAN_CACHE", "on").lower() not in ("off", "false", "0")
+SCAN_CACHE_DB: str = os.getenv("SCAN_CACHE_DB", "scan_cache.sqlite")
+MAX_AGE_DAYS: float = float(os.getenv("SCAN_CACHE_MAX_AGE_DAYS", "30"))
+MAX_ENTRIES: int = int(os.getenv("SCAN_CACHE_MAX_ENTRIES", "200000"))
+LS_REMOTE_TIMEOUT: int = int(os.getenv("SCAN_CACHE_LS_REMOTE_TIMEOUT", "60"))
+EVICT_EVERY: int = int(os.getenv("SCAN_CACHE_EVICT_EVERY", "1000"))
+
+
+def with_token(url: str, token: Optional[str]) -> str:
+    if token and url.startswith("https://") and "@" not in url:
+        return f"https://{token}@{url[len('https://'):]}"
+    return url
+
+
+def cache_key(repo: str) -> str:
+    """host/org/repo for the store; falls back to the URL with any user:token@ removed."""
+    key = canonical_key(repo)
+    if key is not None:
+        return key
+    scheme, sep, rest = repo.partition("://")
+    host, slash, path = (rest if sep else repo).partition("/")
+    host = host.rsplit("@", 1)[-1]
+    return f"{scheme}{sep}{host}{slash}{path}" if sep else f"{host}{slash}{path}"
+
+
+def ref_digest(remote_url: str) -> Optional[str]:
+    """sha256 over the sorted `git ls-remote` output, or None if the remote can't be listed."""
+    try:
+        result = subprocess.run(
+            ["git", "ls-remote", remote_url],
+            capture_output=True, text=True, check=True, timeout=LS_REMOTE_TIMEOUT,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        logging.debug(f"ls-remote failed for {remote_url}: {e}")
+        return None
+    refs = sorted(line for line in result.stdout.splitlines() if line.strip())
+    return hashlib.sha256("\n".join(refs).encode()).hexdigest()
+
+
+class ScanCache:
+    def __init__(self, path: str = SCAN_CACHE_DB, max_age_days: float = MAX_AGE_DAYS, max_entries: int = MAX_ENTRIES) -> None:
+        self.max_age_seconds = max_age_days * 86400
+        self.max_entries = max_entries
+        self._inserts = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS scan_results (
+                repo TEXT NOT NULL,
+                check_name TEXT NOT NULL,
+                check_version TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                result TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (repo, check_name, check_version)
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS scan_results_age ON scan_results (stored_at)")
+        self.conn.commit()
+        self.evict()
+
+    def get(self, repo: str, check: str, version: str, digest: str) -> Optional[Any]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result, stored_at FROM scan_results WHERE repo=? AND check_name=? AND check_version=? AND digest=?",
+                (repo, check, str(version), digest),
+            ).fetchone()
+        if not row or time.time() - row[1] > self.max_age_seconds:
+            return None
+        return json.loads(row[0])
+
+    def put(self, repo: str, check: str, version: str, digest: str, result: Any) -> None:
+        # One row per (repo, check, version): a new digest replaces the stale entry
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scan_results VALUES (?, ?, ?, ?, ?, ?)",
+                (repo, check, str(version), digest, json.dumps(result), time.time()),
+            )
+            self.conn.commit()
+            self._inserts += 1
+            # Evicting scans the age index, so it runs every EVICT_EVERY inserts rather than on each one
+            due = self._inserts % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        with self._lock:
+            cutoff = time.time() - self.max_age_seconds
+            removed = self.conn.execute("DELETE FROM scan_results WHERE stored_at < ?", (cutoff,)).rowcount
+            removed += self.conn.execute(
+                "DELETE FROM scan_results WHERE rowid NOT IN "
+                "(SELECT rowid FROM scan_results ORDER BY stored_at DESC LIMIT ?)",
+                (self.max_entries,),
+            ).rowcount
+            self.conn.commit()
+        if removed:
+            logging.info(f"Scan cache: evicted {removed} entr{'y' if removed == 1 else 'ies'}")
+        return removed
+
+
+_cache: Optional[ScanCache] = None
+
+
+def get_cache() -> Optional[ScanCache]:
+    global _cache
+    if SCAN_CACHE_ENABLED and _cache is None:
+        _cache = ScanCache()
+    return _cache
+
+
+def cached_scan(
+    repo: str,
+    check: str,
+    version: str,
+    compute: Callable[[], Any],
+    remote_url: Optional[str] = None,
+    cacheable: Callable[[Any], bool] = lambda result: result is not None,
+) -> Any:
+    """
+    Returns the stored result for this repo/check if its refs are unchanged,
+    otherwise runs compute() and stores the result when cacheable(result).
+    """
+    cache = get_cache()
+    if cache is None:
+        return compute()
+
+    digest = ref_digest(remote_url or repo)
+    if digest is None:
+        metrics.incr("cache.unavailable", check=check)
+        return compute()
+
+    key = cache_key(repo)
+    hit = cache.get(key, check, version, digest)
+    if hit is not None:
+        metrics.incr("cache.hit", check=check)
+        print(f"[CACHE] {key} unchanged since last {check} scan: {hit}")
+        return hit
+
+    metrics.incr("cache.miss", check=check)
+    result = compute()
+    if cacheable(result):
+        cache.put(key, check, version, digest, result)
+    return result
@@ -3,9 +3,11 @@
 import os
 import csv
 import logging
-from typing import Tuple
-from github import Github, Auth, BadCredentialsException, Organization, Repository
+from typing import Dict, Iterator, Tuple
+from github import Github, BadCredentialsException, GithubException, Organization, Repository
 from dotenv import load_dotenv  # Add this import
+import metrics
+from token_pool import MAX_ATTEMPTS, TokenPool
 
 # Load the .env file to set environment variables
 load_dotenv()  # Add this line
@@ -15,26 +17,48 @@ GHES_BASE_URL: str = os.getenv('GHES_BASE_URL', '')
 GHES_DEFAULT_ORG: str = os.getenv('GHES_ORG', '')
 GHES_TOKEN: str = os.getenv('GHES_TOKEN', '')
 
-# Set up basic logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-
-def validate_ghes_auth() -> Github:
+def validate_ghes_auth() -> TokenPool:
     """
-    Validates GHES authentication and returns the authenticated GitHub instance.
+    Validates GHES authentication and returns the token pool.
     """
     try:
-        auth: Auth.Token = Auth.Token(GHES_TOKEN)
-        g: Github = Github(base_url=GHES_BASE_URL, auth=auth)
-        org: Organization.Organization = g.get_organization(GHES_DEFAULT_ORG)
+        # GHES_TOKENS (comma-separated) and/or GHES_TOKEN; picks the token with the most headroom
+        pool: TokenPool = TokenPool.from_env('GHES_TOKEN', GHES_BASE_URL)
+        org: Organization.Organization = pool.github(GHES_DEFAULT_ORG).get_organization(GHES_DEFAULT_ORG)
         logging.info(f"Authenticated with GHES. Organization: {org.login}")
-        return g
+        return pool
     except BadCredentialsException:
         raise ValueError("Invalid GHES credentials. Please check your token and organization name.")
     except Exception as e:
         raise ValueError(f"Error authenticating with GHES: {e}")
 
 
+def iter_org_repos(pool: TokenPool, org_name: str) -> Iterator[Repository.Repository]:
+    """
+    Walks the org's repos a page at a time, re-acquiring the token with the most
+    headroom for every page so the whole pool shares the walk.
+    """
+    orgs: Dict[int, Organization.Organization] = {}  # one Organization per client, fetched once
+    page = 0
+    while True:
+        for attempt in range(MAX_ATTEMPTS):
+            g: Github = pool.github(org_name)
+            try:
+                if id(g) not in orgs:
+                    orgs[id(g)] = g.get_organization(org_name)
+                batch = orgs[id(g)].get_repos().get_page(page)
+                break
+            except GithubException as e:
+                pool.report_error(g, e)
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+        if not batch:
+            return
+        yield from batch
+        page += 1
+
+
 def check_repo_size(repo: Repository.Repository) -> Tuple[float, str, str]:
     """
     Checks the repository size and classifies it.
@@ -61,10 +85,11 @@ def check_repo_size(repo: Repository.Repository) -> Tuple[float, str, str]:
 
 
 def main() -> bool:
+    # Set up basic logging (here rather than at import, so importing this module has no side effects)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     try:
-        ghes: Github = validate_ghes_auth()
-        org: Organization.Organization = ghes.get_organization(GHES_DEFAULT_ORG)
-        repos = org.get_repos()
+        pool: TokenPool = validate_ghes_auth()
+        repos = iter_org_repos(pool, GHES_DEFAULT_ORG)
 
         csv_report_filename: str = f"repo_size_report_{GHES_DEFAULT_ORG}.csv"
         with open(csv_report_filename, 'w', newline='') as csvfile:
@@ -73,7 +98,9 @@ def main() -> bool:
 
             for repo in repos:
                 size_mb, classification, check_result = check_repo_size(repo)
-                writer.writerow([repo.name, size_mb, classification, check_result])
+                metrics.incr("repos.classified", classification=classification)
+                with metrics.stage("csv_write"):
+                    writer.writerow([repo.name, size_mb, classification, check_result])
 
         logging.info(f"Repo size check completed. Report generated: {csv_report_filename}")
         return True
@@ -87,4 +114,4 @@ def main() -> bool:
 
 
 if __name__ == "__main__":
-    main()
+    metrics.run_main(main)
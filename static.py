@@ -1,9 +1,13 @@
-import requests
-import pandas as pd
 import os
+import csv
+import metrics
+from report_sink import ReportWriter, report_path
+from scan_cache import cached_scan, with_token
+from url_input import unique
 
-# Set your GitHub token here
-GITHUB_TOKEN = "YOUR_GITHUB_TOKEN"
+# GitHub token and API base (override via environment)
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "YOUR_GITHUB_TOKEN")
+API_BASE = os.getenv("GHES_API_URL", "https://github-test.qualcomm.com/api/v3")
 
 # Input and output files
 INPUT_FILE = "repo_links.csv"
@@ -12,26 +16,31 @@ OUTPUT_FILE = "repo_links_with_status.csv"
 # Dynamic and static clues
 DYNAMIC_CLUES = ['package.json', 'next.config.js', 'gatsby-config.js', 'webpack.config.js', 'nuxt.config.js']
 STATIC_CLUES = ['_config.yml', 'index.html']
+# Bump when the clue lists or analysis change so cached results are not reused
+CHECK_VERSION = "1:" + ",".join(DYNAMIC_CLUES + STATIC_CLUES)
 
 # Helper to extract API URL from the repo URL
 def get_api_url(repo_url):
     parts = repo_url.strip().split('/')
     owner = parts[-2]
     repo = parts[-1]
-    return f"https://github-test.qualcomm.com/api/v3/repos/{owner}/{repo}/contents"
+    return f"{API_BASE}/repos/{owner}/{repo}/contents"
 
 # Recursive function to get **all** files in the repo
-def get_all_files(api_url, headers, all_files=[]):
-    response = requests.get(api_url, headers=headers)
+# Non-200 statuses are appended to errors so callers can tell a failed crawl from an empty one
+def get_all_files(api_url, headers, all_files=[], errors=None):
+    response = metrics.http_get(api_url, headers=headers)
     if response.status_code == 200:
         contents = response.json()
         for item in contents:
             if item['type'] == 'file':
                 all_files.append(item['name'])
             elif item['type'] == 'dir':
-                get_all_files(item['url'], headers, all_files)
+                get_all_files(item['url'], headers, all_files, errors)
     else:
         print(f"Error fetching {api_url}: {response.status_code} - {response.text}")
+        if errors is not None:
+            errors.append(response.status_code)
     return all_files
 
 # Analyze repo based on files found
@@ -46,30 +55,46 @@ def analyze_repo_files(files):
     else:
         return "Unknown"
 
-def main():
-    df = pd.read_csv(INPUT_FILE)
-    statuses = []
+# Crawl the repo contents and classify it; 'CRAWL_FAILED' if any contents request failed
+def crawl_status(repo_url, headers):
+    api_url = get_api_url(repo_url)
+
+    # Recursively gather all files
+    errors = []
+    with metrics.stage("crawl_contents", check="static", repo=repo_url):
+        all_files = get_all_files(api_url, headers, [], errors)
+    metrics.incr("scan.files", len(all_files), check="static")
+    if errors:
+        metrics.incr("scan.crawl_failed", check="static")
+        return "CRAWL_FAILED"
 
-    for index, row in df.iterrows():
-        repo_url = row['url']
-        api_url = get_api_url(repo_url)
+    return analyze_repo_files(all_files)
+
+def main():
+    output = report_path(OUTPUT_FILE)
+    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
 
-        print(f"\nAnalyzing repo: {repo_url}")
-        headers = {"Authorization": f"token {GITHUB_TOKEN}"}
+    # Input rows are streamed through with a status column appended
+    with open(INPUT_FILE, newline='') as infile:
+        reader = csv.DictReader(infile)
+        with ReportWriter(output, list(reader.fieldnames or []) + ['status']) as report:
+            # Streamed row by row; the same repo spelled differently is analyzed once
+            for row in unique(reader, lambda row: row['url'], label=INPUT_FILE):
+                repo_url = row['url']
 
-        # Recursively gather all files
-        all_files = get_all_files(api_url, headers, [])
+                print(f"\nAnalyzing repo: {repo_url}")
 
-        # Analyze and record status
-        status = analyze_repo_files(all_files)
-        print(f"Status: {status}")
+                # Analyze and record status (skipped when the repo's refs are unchanged since the last run)
+                status = cached_scan(
+                    repo_url, "static", CHECK_VERSION, lambda: crawl_status(repo_url, headers),
+                    remote_url=with_token(repo_url, GITHUB_TOKEN),
+                    cacheable=lambda s: s != "CRAWL_FAILED",
+                )
+                print(f"Status: {status}")
 
-        statuses.append(status)
+                report.write({**row, 'status': status})
 
-    # Save results to a new CSV
-    df['status'] = statuses
-    df.to_csv(OUTPUT_FILE, index=False)
-    print(f"\n✅ Analysis complete. Results saved to {OUTPUT_FILE}.")
+    print(f"\n✅ Analysis complete. Results saved to {output}.")
 
 if __name__ == "__main__":
-    main()
+    metrics.run_main(main)
@@ -0,0 +1,191 @@
+"""
+Generates synthetic GHES orgs for the local stub server (ghes_stub.py).
+
+Writes <out>/fixture.json (orgs, repos, issues, tags, file trees, wiki pages)
+and real bare git repos under <out>/git/<org>/<repo>.git (plus .wiki.git for
+repos with a wiki), so clone-based scripts have something to clone.
+
+With --mirror, every org also gets a "<org>-dest" copy with --drift of its
+issues/tags removed or altered, for the source-vs-destination validators.
+
+Example:
+    python synth_org.py --out bench_fixture --orgs 2 --repos 20 --issues 50 \
+        --tags 10 --files 30 --large-blobs 1 --large-blob-size 5000000 --mirror
+"""
+
+import os
+import json
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+STATIC_CLUES = ['_config.yml', 'index.html']
+DYNAMIC_CLUES = ['package.json', 'webpack.config.js']
+ATTACHMENT_SIZE = 64 * 1024
+GIT_IDENTITY = ["-c", "user.name=synth", "-c", "user.email=synth@example.com"]
+
+
+def _git(args: List[str], cwd: str) -> str:
+    result = subprocess.run(["git", *GIT_IDENTITY, *args], cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def _write_random(path: str, size: int, rng: random.Random) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            chunk = min(remaining, 1024 * 1024)
+            f.write(rng.randbytes(chunk))
+            remaining -= chunk
+
+
+def _make_bare_repo(work_files: Dict[str, int], bare_path: str, tags: List[str], rng: random.Random) -> str:
+    """Commits the given {path: size} files into a new bare repo and returns the commit sha."""
+    with tempfile.TemporaryDirectory() as work:
+        _git(["init", "-q", "-b", "main"], work)
+        for rel_path, size in work_files.items():
+            _write_random(os.path.join(work, rel_path), size, rng)
+        _git(["add", "-A"], work)
+        _git(["commit", "-q", "-m", "synthetic content"], work)
+        sha = _git(["rev-parse", "HEAD"], work)
+        for tag in tags:
+            _git(["tag", tag], work)
+        if os.path.exists(bare_path):
+            shutil.rmtree(bare_path)
+        os.makedirs(os.path.dirname(bare_path), exist_ok=True)
+        _git(["clone", "-q", "--bare", work, bare_path], work)
+    return sha
+
+
+def _issues(count: int, rng: random.Random) -> List[Dict]:
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    issues = []
+    for number in range(1, count + 1):
+        issues.append({
+            "number": number,
+            "title": f"Synthetic issue {number}",
+            "body": " ".join(rng.choice(["lorem", "ipsum", "dolor", "sit", "amet"]) for _ in range(rng.randint(5, 60))),
+            "state": rng.choice(["open", "closed"]),
+            "comments": rng.randint(0, 8),
+            "updated_at": (base + timedelta(minutes=number * 7)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+    return issues
+
+
+def _drift(repo: Dict, drift: float, rng: random.Random) -> Dict:
+    """Destination copy of a repo with a fraction of issues/tags dropped or altered."""
+    dest = {**repo, "git": False, "issues": [], "tags": []}
+    for issue in repo["issues"]:
+        roll = rng.random()
+        if roll < drift / 2:
+            continue  # missing in destination
+        if roll < drift:
+            issue = {**issue, "body": issue["body"][: len(issue["body"]) // 2]}  # truncated
+        dest["issues"].append(issue)
+    dest["tags"] = [t for t in repo["tags"] if rng.random() >= drift]
+    return dest
+
+
+def generate(args: argparse.Namespace) -> Dict:
+    rng = random.Random(args.seed)
+    git_root = os.path.abspath(os.path.join(args.out, "git"))
+    fixture: Dict = {"orgs": {}}
+
+    for org_index in range(args.orgs):
+        org = f"{args.prefix}-{org_index}"
+        repos: Dict[str, Dict] = {}
+        for repo_index in range(args.repos):
+            name = f"repo-{repo_index}"
+            files: Dict[str, int] = {}
+            for file_index in range(args.files):
+                files[f"src/dir{file_index % 5}/file{file_index}.txt"] = args.file_size
+            for blob_index in range(args.large_blobs):
+                files[f"assets/large{blob_index}.bin"] = args.large_blob_size
+            clue = rng.choice(STATIC_CLUES + DYNAMIC_CLUES + [None])
+            if clue:
+                files[clue] = 256
+            tag_names = [f"v{repo_index}.{t}" for t in range(args.tags)]
+
+            sha = _make_bare_repo(files, os.path.join(git_root, org, f"{name}.git"), tag_names, rng)
+            has_wiki = rng.random() < args.wiki_ratio
+            wiki_pages: Dict[str, List[Dict]] = {}
+            if has_wiki:
+                wiki_files = {"Home.md": 512}
+                for page_index in range(args.wiki_pages):
+                    page = f"Page-{page_index}"
+                    wiki_files[f"{page}.md"] = 512
+                    attachments = []
+                    if page_index % 2 == 0:
+                        upload = f"uploads/{page}-diagram.png"
+                        wiki_files[upload] = ATTACHMENT_SIZE
+                        attachments.append({"path": upload, "size": ATTACHMENT_SIZE})
+                    wiki_pages[page] = attachments
+                _make_bare_repo(wiki_files, os.path.join(git_root, org, f"{name}.wiki.git"), [], rng)
+
+            total_bytes = sum(files.values())
+            repos[name] = {
+                "name": name,
+                "size_kb": max(total_bytes // 1024, 1),
+                "sha": sha,
+                "archived": False,
+                "disabled": rng.random() < args.disabled_ratio,
+                "has_wiki": has_wiki,
+                "wiki_pages": wiki_pages,
+                "files": [{"path": p, "size": s} for p, s in sorted(files.items())],
+                "tags": [{"name": t, "sha": sha} for t in tag_names],
+                "issues": _issues(args.issues, rng),
+                "git": True,
+            }
+            print(f"  {org}/{name}: {len(files)} files, {total_bytes / 1024 / 1024:.1f} MB")
+
+        fixture["orgs"][org] = {"repos": repos}
+        if args.mirror:
+            fixture["orgs"][f"{org}-dest"] = {
+                "repos": {name: _drift(repo, args.drift, rng) for name, repo in repos.items()},
+                "mirror_of": org,
+            }
+
+    fixture["generated_with"] = vars(args)
+    fixture["digest"] = hashlib.sha256(json.dumps(vars(args), sort_keys=True).encode()).hexdigest()[:12]
+    with open(os.path.join(args.out, "fixture.json"), "w") as f:
+        json.dump(fixture, f)
+    return fixture
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generate synthetic GHES orgs for the stub server")
+    parser.add_argument("--out", default="bench_fixture")
+    parser.add_argument("--prefix", default="synth-org")
+    parser.add_argument("--orgs", type=int, default=1)
+    parser.add_argument("--repos", type=int, default=10)
+    parser.add_argument("--issues", type=int, default=20)
+    parser.add_argument("--tags", type=int, default=5)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--file-size", type=int, default=4096)
+    parser.add_argument("--large-blobs", type=int, default=0)
+    parser.add_argument("--large-blob-size", type=int, default=2 * 1024 * 1024)
+    parser.add_argument("--wiki-ratio", type=float, default=0.5)
+    parser.add_argument("--wiki-pages", type=int, default=4)
+    parser.add_argument("--disabled-ratio", type=float, default=0.0)
+    parser.add_argument("--mirror", action="store_true", help="also create <org>-dest copies")
+    parser.add_argument("--drift", type=float, default=0.05, help="fraction of issues/tags altered in -dest")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    os.makedirs(args.out, exist_ok=True)
+    fixture = generate(args)
+    repo_count = sum(len(o["repos"]) for o in fixture["orgs"].values())
+    print(f"✅ Fixture written to {args.out} ({len(fixture['orgs'])} orgs, {repo_count} repos)")
+
+
+if __name__ == "__main__":
+    main()
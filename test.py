@@ -5,13 +5,10 @@ Outputs any missing tags to a CSV file.
 """
 
 import os
-import csv
 import logging
 import traceback
 from typing import Dict, Optional
 from github import (
-    Github,
-    Auth,
     BadCredentialsException,
     RateLimitExceededException,
     UnknownObjectException,
@@ -19,49 +16,43 @@ from github import (
 )
 from requests.exceptions import RequestException
 from dotenv import load_dotenv
+import metrics
+from report_sink import ReportWriter, report_path
+from token_pool import TokenPool, load_tokens
 
 # Load environment variables from .env
 load_dotenv()
 
-# --- Logging Config ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-
 # --- Config values from .env ---
 SOURCE_BASE_URL: Optional[str] = os.getenv("SOURCE_BASE_URL")
-SOURCE_TOKEN: Optional[str] = os.getenv("SOURCE_TOKEN")
 SOURCE_ORG: Optional[str] = os.getenv("SOURCE_ORG")
 
-DESTINATION_TOKEN: Optional[str] = os.getenv("DESTINATION_TOKEN")
 DESTINATION_ORG: Optional[str] = os.getenv("DESTINATION_ORG")
+DESTINATION_API_URL: str = os.getenv("DESTINATION_API_URL", "https://api.github.com")
+
+# Tokens come from SOURCE_TOKENS/SOURCE_TOKEN and DESTINATION_TOKENS/DESTINATION_TOKEN
 
 OUTPUT_CSV: str = os.getenv("OUTPUT_CSV", "missing_tags_report.csv")
+REPORT_FIELDS: list[str] = ["Repository Name", "Missing Tag Name", "Commit SHA"]
 
 
 # --- GitHub Authentication ---
-def authenticate_github(token: str, base_url: Optional[str] = None) -> Github:
-    if base_url:
-        return Github(base_url=base_url, auth=Auth.Token(token))
-    return Github(auth=Auth.Token(token))
-
-
 def validate_auth(
-    token: str,
+    token_name: str,
     org_name: str,
     base_url: Optional[str] = None,
     label: str = ""
-) -> Github:
-    if not token or len(token.strip()) < 10:
+) -> TokenPool:
+    tokens: list[str] = [t for t in load_tokens(token_name) if len(t) >= 10]
+    if not tokens:
         raise ValueError(f"GitHub token is missing or malformed for {label}")
 
-    logging.info(f"Authenticating with {label} GitHub for org: {org_name}")
+    logging.info(f"Authenticating with {label} GitHub for org: {org_name} ({len(tokens)} token(s))")
     try:
-        gh: Github = authenticate_github(token.strip(), base_url)
-        org = gh.get_organization(org_name)
+        pool = TokenPool(tokens, base_url or DESTINATION_API_URL)
+        pool.github(org_name).get_organization(org_name)
         logging.info(f"Successfully authenticated with {label} GitHub.")
-        return gh
+        return pool
     except BadCredentialsException:
         raise ValueError(f"Invalid GitHub credentials for {label}")
     except Exception as e:
@@ -86,33 +77,34 @@ def compare_tags(
     return missing_tags
 
 
-# --- Write missing tags to CSV ---
-def write_csv(missing_tag_data: list[dict]) -> None:
-    logging.info(f"Writing missing tags report to CSV: {OUTPUT_CSV}")
-    with open(OUTPUT_CSV, "w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Repository Name", "Missing Tag Name", "Commit SHA"])
-        for row in missing_tag_data:
-            writer.writerow([row["repo"], row["tag"], row["sha"]])
-    logging.info("CSV write complete.")
+# --- Stream missing tags to the report ---
+def open_report() -> ReportWriter:
+    path = report_path(OUTPUT_CSV)
+    logging.info(f"Writing missing tags report to: {path}")
+    return ReportWriter(path, REPORT_FIELDS)
 
 
 # --- Main Logic: Verify tags for all repos in the org ---
 def verify_org_tags() -> None:
+    # Configured here rather than at import, so importing this module has no side effects
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
     try:
         logging.info("Starting org-level tag verification...")
 
         # Authenticate to GitHub for source and destination
-        source_gh: Github = validate_auth(
-            SOURCE_TOKEN, SOURCE_ORG, SOURCE_BASE_URL, label="source"
+        source_pool: TokenPool = validate_auth(
+            "SOURCE_TOKEN", SOURCE_ORG, SOURCE_BASE_URL, label="source"
         )
-        destination_gh: Github = validate_auth(
-            DESTINATION_TOKEN, DESTINATION_ORG, label="destination"
+        destination_pool: TokenPool = validate_auth(
+            "DESTINATION_TOKEN", DESTINATION_ORG, label="destination"
         )
 
         # Get org objects
-        source_org = source_gh.get_organization(SOURCE_ORG)
-        destination_org = destination_gh.get_organization(DESTINATION_ORG)
+        source_org = source_pool.github(SOURCE_ORG).get_organization(SOURCE_ORG)
+        destination_org = destination_pool.github(DESTINATION_ORG).get_organization(DESTINATION_ORG)
 
         # Get list of repos
         source_repos = {repo.name: repo for repo in source_org.get_repos()}
@@ -120,34 +112,40 @@ def verify_org_tags() -> None:
         logging.info(f"Found {len(source_repos)} repos in source org.")
         logging.info(f"Found {len(destination_repos)} repos in destination org.")
 
-        # Compare tags for each repo present in both orgs
-        missing_tag_data: list[dict] = []
-
-        for repo_name, source_repo in source_repos.items():
-            if repo_name not in destination_repos:
-                logging.warning(f"Repo '{repo_name}' not found in destination. Skipping.")
-                continue
-
-            destination_repo = destination_repos[repo_name]
-            source_tags = fetch_tags(source_repo)
-            destination_tags = fetch_tags(destination_repo)
-
-            missing_tags = compare_tags(source_tags, destination_tags)
-            if missing_tags:
-                for name, sha in missing_tags.items():
-                    missing_tag_data.append({
-                        "repo": repo_name,
-                        "tag": name,
-                        "sha": sha
-                    })
-                logging.warning(f"{len(missing_tags)} tag(s) missing in '{repo_name}'.")
-            else:
-                logging.info(f"All tags present in '{repo_name}'.")
-
-        # Write the final report to CSV
-        write_csv(missing_tag_data)
+        # Compare tags for each repo present in both orgs, streaming rows to the report
+        with open_report() as report:
+            for repo_name, source_repo in source_repos.items():
+                if repo_name not in destination_repos:
+                    logging.warning(f"Repo '{repo_name}' not found in destination. Skipping.")
+                    continue
+
+                # Re-bind each repo to whichever token currently has the most headroom
+                source_repo = source_pool.github(SOURCE_ORG).get_repo(source_repo.full_name, lazy=True)
+                destination_repo = destination_pool.github(DESTINATION_ORG).get_repo(
+                    destination_repos[repo_name].full_name, lazy=True
+                )
+                with metrics.stage("fetch_source_tags", repo=repo_name):
+                    source_tags = fetch_tags(source_repo)
+                with metrics.stage("fetch_dest_tags", repo=repo_name):
+                    destination_tags = fetch_tags(destination_repo)
+
+                missing_tags = compare_tags(source_tags, destination_tags)
+                metrics.incr("tags.missing", len(missing_tags))
+                if missing_tags:
+                    for name, sha in missing_tags.items():
+                        report.write({
+                            "Repository Name": repo_name,
+                            "Missing Tag Name": name,
+                            "Commit SHA": sha
+                        })
+                    logging.warning(f"{len(missing_tags)} tag(s) missing in '{repo_name}'.")
+                else:
+                    logging.info(f"All tags present in '{repo_name}'.")
+
+        logging.info(f"Report complete: {report.rows_written} row(s) in {report.path}")
 
     except (RateLimitExceededException, RequestException) as e:
+        metrics.incr("api.errors", kind=type(e).__name__)
         logging.error(f"GitHub API error: {e}")
     except ValueError as e:
         logging.error(e)
@@ -158,4 +156,4 @@ def verify_org_tags() -> None:
 
 # --- Entry Point ---
 if __name__ == "__main__":
-    verify_org_tags()
+    metrics.run_main(verify_org_tags)
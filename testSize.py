@@ -3,24 +3,29 @@
 import os
 import csv
 import logging
-from github import Github, Auth, BadCredentialsException
-from dotenv import load_dotenv
+import metrics
 
-# Load the .env file
-load_dotenv()
+def main():
+    # PyGithub and dotenv are imported here so `hirepanda size --quick` only pays for them when it runs
+    from github import Github, Auth, BadCredentialsException
+    from dotenv import load_dotenv
 
-# Get environment variables
-GHES_BASE_URL = os.getenv('GHES_BASE_URL', '')
-GHES_ORG = os.getenv('GHES_ORG', '')
-GHES_TOKEN = os.getenv('GHES_TOKEN', '')
+    # Load the .env file
+    load_dotenv()
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Get environment variables
+    GHES_BASE_URL = os.getenv('GHES_BASE_URL', '')
+    GHES_ORG = os.getenv('GHES_ORG', '')
+    GHES_TOKEN = os.getenv('GHES_TOKEN', '')
+
+    # Set up logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def main():
     try:
         # Authenticate with GHES
         auth = Auth.Token(GHES_TOKEN)
+        # Per-request latency/status metrics for every PyGithub call
+        metrics.instrument_pygithub()
         g = Github(base_url=GHES_BASE_URL, auth=auth)
 
         # Check if the org exists
@@ -34,6 +39,7 @@ def main():
 
             # Loop through all repos and write to CSV
             for repo in repos:
+                metrics.incr("repos.listed")
                 writer.writerow([repo.name, repo.size])
 
         logging.info("Test CSV file created: test_repo_sizes.csv")
@@ -44,4 +50,4 @@ def main():
         logging.error(f"Something went wrong: {e}")
 
 if __name__ == "__main__":
-    main()
+    metrics.run_main(main)
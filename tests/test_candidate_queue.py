@@ -0,0 +1,93 @@
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+from pymongo.errors import CursorNotFound
+
+import candidate_queue
+from candidate_queue import MIN_SIZE_BYTES, mongo_candidates, prefetch
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def collection():
+    col = mongomock.MongoClient().db.repos
+    col.insert_many(
+        [{"repo_url": f"https://ghes.example.com/org/repo-{i}", "raw_size_bytes": (401 + i % 7) * MB} for i in range(40)]
+        + [{"repo_url": "https://ghes.example.com/org/small", "raw_size_bytes": 10 * MB}]
+        + [{"owner_name": "org", "repo_name": "no-url", "raw_size_bytes": 500 * MB}]
+    )
+    return col
+
+
+class FlakyCollection:
+    """Wraps a collection so each cursor dies after `after` documents, `kills` times in total."""
+
+    def __init__(self, collection, after: int, kills: int) -> None:
+        self.collection = collection
+        self.after = after
+        self.kills = kills
+
+    def find(self, *args, **kwargs):
+        outer = self
+
+        class Cursor:
+            def sort(self, *sort_args):
+                self.cursor = outer.collection.find(*args, **kwargs).sort(*sort_args)
+                return self
+
+            def batch_size(self, _):
+                return self
+
+            def __iter__(self):
+                for i, doc in enumerate(self.cursor):
+                    if i == outer.after and outer.kills:
+                        outer.kills -= 1
+                        raise CursorNotFound("cursor id not found")
+                    yield doc
+
+        return Cursor()
+
+
+def sizes(collection, urls):
+    by_url = {doc.get("repo_url") or f"{candidate_queue.GHES_WEB_URL}/{doc['owner_name']}/{doc['repo_name']}": doc
+              for doc in collection.find()}
+    return [by_url[url]["raw_size_bytes"] for url in urls]
+
+
+@pytest.mark.parametrize("order", ["largest", "smallest"])
+def test_candidates_stream_in_size_order(collection, order):
+    urls = list(mongo_candidates(collection, order=order))
+    assert len(urls) == 41
+    assert "https://ghes.example.com/org/small" not in urls
+    assert sizes(collection, urls) == sorted(sizes(collection, urls), reverse=order == "largest")
+    assert all(size > MIN_SIZE_BYTES for size in sizes(collection, urls))
+
+
+@pytest.mark.parametrize("order", ["largest", "smallest"])
+def test_cursor_not_found_resumes_without_gaps_or_duplicates(collection, order, monkeypatch):
+    monkeypatch.setattr(candidate_queue.time, "sleep", lambda seconds: None)
+    expected = list(mongo_candidates(collection, order=order))
+    resumed = list(mongo_candidates(FlakyCollection(collection, after=9, kills=3), order=order))
+    assert sorted(resumed) == sorted(expected)
+    assert len(resumed) == len(set(resumed))
+    assert sizes(collection, resumed) == sorted(sizes(collection, resumed), reverse=order == "largest")
+
+
+def test_cursor_that_keeps_dying_gives_up(collection, monkeypatch):
+    monkeypatch.setattr(candidate_queue.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(candidate_queue, "MAX_CURSOR_RESUMES", 2)
+    with pytest.raises(CursorNotFound):
+        list(mongo_candidates(FlakyCollection(collection, after=0, kills=100)))
+
+
+def test_prefetch_surfaces_producer_errors():
+    def items():
+        yield 1
+        raise RuntimeError("boom")
+
+    consumed = []
+    with pytest.raises(RuntimeError):
+        for item in prefetch(items()):
+            consumed.append(item)
+    assert consumed == [1]
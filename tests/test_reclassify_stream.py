@@ -0,0 +1,95 @@
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import reclassify_stream
+from complexity_eval import MEDIUM, ORG_COLLECTION, REPO_COLLECTION, STILL_COMPLEX
+from reclassify_stream import OrgRollup
+
+
+def repo(repo_id, owner, updated_at, *complex_fields):
+    return {
+        "_id": repo_id,
+        "owner_name": owner,
+        "complexity_score": "Complex" if complex_fields else "Simple",
+        "complexity_factors": {field: "Complex" for field in complex_fields},
+        "updated_at": updated_at,
+    }
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient().db
+    db[ORG_COLLECTION].insert_many([
+        {"org_name": "org-a", "complexity_score": "Complex"},
+        {"org_name": "org-b", "complexity_score": "Complex"},
+    ])
+    db[REPO_COLLECTION].insert_many([
+        repo(1, "org-a", 1, "has_actions"),
+        repo(2, "org-a", 2, "has_wiki"),
+        repo(3, "org-b", 3, "has_wiki"),
+    ])
+    return db
+
+
+def classification(db, org_name):
+    return db[ORG_COLLECTION].find_one({"org_name": org_name})["final_classification"]
+
+
+def test_rebuild_counts_complex_factors(db):
+    rollup = OrgRollup(db)
+    assert rollup.rebuild() == 2
+    counts = rollup.rollup_col.find_one({"_id": "org-a"})["counts"]
+    assert counts["has_actions"] == 1 and counts["has_wiki"] == 1
+    assert classification(db, "org-a") == STILL_COMPLEX
+    assert classification(db, "org-b") == MEDIUM
+
+
+def test_poll_flips_only_when_the_hard_stop_verdict_changes(db):
+    rollup = OrgRollup(db)
+    rollup.rebuild()
+    db[REPO_COLLECTION].replace_one({"_id": 1}, repo(1, "org-a", 10))
+    db[REPO_COLLECTION].replace_one({"_id": 3}, repo(3, "org-b", 11, "has_wiki", "has_releases"))
+    assert rollup.poll_once() == 2
+    assert classification(db, "org-a") == MEDIUM
+    assert classification(db, "org-b") == STILL_COMPLEX
+    # Re-applying the same documents changes nothing
+    assert rollup.apply(1, db[REPO_COLLECTION].find_one({"_id": 1})) is None
+
+
+def test_apply_moves_counts_between_orgs(db):
+    rollup = OrgRollup(db)
+    rollup.rebuild()
+    assert rollup.apply(1, repo(1, "org-b", 10, "has_actions")) == STILL_COMPLEX
+    assert classification(db, "org-a") == MEDIUM
+    assert rollup.apply(1, None) == MEDIUM
+    assert rollup.state_col.find_one({"_id": 1}) is None
+
+
+def test_recover_after_crash_between_state_and_rollup(db, monkeypatch):
+    rollup = OrgRollup(db)
+    rollup.rebuild()
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr(rollup, "_bump", crash)
+    with pytest.raises(RuntimeError):
+        rollup.apply(1, repo(1, "org-a", 10))
+    monkeypatch.undo()
+
+    # The replayed event now diffs against the already-written state; recover() repairs the counters first
+    assert rollup.recover() == 1
+    assert rollup.apply(1, repo(1, "org-a", 10)) is None
+    assert rollup.rollup_col.find_one({"_id": "org-a"})["counts"]["has_actions"] == 0
+    assert classification(db, "org-a") == MEDIUM
+    assert rollup.state_col.count_documents({"dirty": True}) == 0
+
+
+def test_follow_falls_back_to_polling_without_change_streams(db, monkeypatch):
+    rollup = OrgRollup(db)
+    rollup.rebuild()
+    polled = []
+    monkeypatch.setattr(rollup, "poll", lambda: polled.append(True))
+    reclassify_stream.follow(rollup, "auto")
+    assert polled == [True]
@@ -0,0 +1,48 @@
+import time
+import work_queue
+from work_queue import Heartbeat, WorkQueue
+
+
+def test_enqueue_keeps_every_repo_in_an_org(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    tasks = [
+        {"org": org, "repo_url": f"https://ghes.example.com/{org}/repo-{i}"}
+        for org in ("org-a", "org-b")
+        for i in range(3)
+    ]
+    assert queue.enqueue("binary", iter(tasks), key_field="repo_url") == 6
+    # Re-enqueueing the same repos adds nothing
+    assert queue.enqueue("binary", iter(tasks), key_field="repo_url") == 0
+    assert queue.counts("binary") == {"pending": 6}
+
+
+def test_enqueue_without_key_field_uses_whole_payload(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    tasks = [{"org": "org-a", "repo_url": f"https://ghes.example.com/org-a/repo-{i}"} for i in range(3)]
+    assert queue.enqueue("binary", iter(tasks)) == 3
+
+
+def test_expired_lease_stops_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr(work_queue, "MAX_ATTEMPTS", 3)
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    queue.enqueue("binary", iter([{"org": "org-a", "repo_url": "https://ghes.example.com/org-a/huge"}]), key_field="repo_url")
+    # The worker dies every time: the lease is never renewed or completed
+    for attempt in range(1, 4):
+        task = queue.lease("binary", f"worker-{attempt}", lease_seconds=-1)
+        assert task is not None and task.attempts == attempt
+    assert queue.lease("binary", "worker-4", lease_seconds=-1) is None
+    assert queue.counts("binary") == {"failed": 1}
+    assert queue.unfinished("binary") == 0
+
+
+def test_heartbeat_renews_the_current_task_only(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    queue = WorkQueue(path)
+    queue.enqueue("binary", iter([{"org": "org-a", "repo_url": f"u{i}"} for i in range(2)]), key_field="repo_url")
+    first = queue.lease("binary", "w", lease_seconds=0.3)
+    with Heartbeat(path, "w", lease_seconds=0.3) as heartbeat:
+        with heartbeat.track(first.id):
+            time.sleep(0.5)
+            # Renewed past its original expiry, so nobody else can take it over
+            assert queue.lease("binary", "other", lease_seconds=0.3).key == "u1"
+        assert queue.complete(first.id, "w", {"ok": True})
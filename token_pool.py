@@ -0,0 +1,230 @@
+"""
+Pool of GitHub tokens for a single host.
+
+Each token keeps its own rate-limit budget (read from the X-RateLimit-* response
+headers), so requests are routed to the token with the most headroom that can
+actually see the target org. Tokens that start returning 401 are quarantined; a
+403 on a single resource (disabled repo, SAML, IP allow-list) is returned to the
+caller, since another token would get the same answer.
+
+Tokens are loaded from a comma-separated <NAME>S variable (e.g. GITHUB_TOKENS)
+plus the single <NAME> variable the scripts already use (e.g. GITHUB_TOKEN).
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import requests
+
+import metrics
+
+# --- Config ---
+DEFAULT_LIMIT: int = 5000
+QUARANTINE_SECONDS: int = int(os.getenv("TOKEN_QUARANTINE_SECONDS", "900"))
+MAX_ATTEMPTS: int = 3
+
+
+def load_tokens(name: str) -> List[str]:
+    """Reads <name>S (comma-separated) and <name> from the environment, de-duplicated."""
+    tokens: List[str] = []
+    for raw in os.getenv(f"{name}S", "").split(",") + [os.getenv(name, "")]:
+        token = raw.strip()
+        if token and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+class TokenState:
+    def __init__(self, token: str) -> None:
+        self.token: str = token
+        self.remaining: int = DEFAULT_LIMIT
+        self.reset_at: float = 0.0
+        self.quarantined_until: float = 0.0
+        self.blocked_until: float = 0.0  # backoff after a rate-limited response
+        self.org_access: Dict[str, bool] = {}
+        self.client = None  # PyGithub client, created on demand
+
+    @property
+    def label(self) -> str:
+        return f"...{self.token[-4:]}"
+
+    def headroom(self, now: float) -> int:
+        if now < self.blocked_until:
+            return 0
+        if self.reset_at and now >= self.reset_at:
+            return DEFAULT_LIMIT
+        return self.remaining
+
+    def ready_at(self, now: float) -> float:
+        """When this token can be used again."""
+        return max(self.blocked_until, self.reset_at if self.remaining <= 0 else 0.0, now)
+
+
+class TokenPool:
+    def __init__(self, tokens: List[str], base_url: str, auth_scheme: str = "token") -> None:
+        if not tokens:
+            raise ValueError(f"No tokens configured for {base_url}")
+        self.base_url: str = base_url.rstrip("/")
+        self.auth_scheme: str = auth_scheme
+        self.states: List[TokenState] = [TokenState(t) for t in tokens]
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        logging.info(f"Token pool for {self.base_url}: {len(self.states)} token(s)")
+
+    @classmethod
+    def from_env(cls, name: str, base_url: str, auth_scheme: str = "token") -> "TokenPool":
+        return cls(load_tokens(name), base_url, auth_scheme)
+
+    # --- Bookkeeping ---
+    def update_from_headers(self, state: TokenState, headers) -> None:
+        # GraphQL (and search) have budgets of their own; only the REST core budget drives routing
+        if headers.get("X-RateLimit-Resource", "core") != "core":
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        with self._lock:
+            if remaining is not None:
+                state.remaining = int(remaining)
+            if reset is not None:
+                state.reset_at = float(reset)
+
+    def quarantine(self, state: TokenState, status: int) -> None:
+        with self._lock:
+            state.quarantined_until = time.time() + QUARANTINE_SECONDS
+        logging.warning(f"Token {state.label} returned {status}; quarantined for {QUARANTINE_SECONDS}s")
+
+    def _is_rate_limited(self, response) -> bool:
+        return response.status_code in (403, 429) and (
+            response.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in response.headers
+        )
+
+    def throttle(self, state: TokenState, headers) -> None:
+        """Parks a token that was rate limited: for Retry-After seconds, or until its budget resets."""
+        now = time.time()
+        retry_after = headers.get("Retry-After")
+        with self._lock:
+            if retry_after is not None:
+                # Secondary limit: the primary budget is untouched, only this burst has to wait
+                state.blocked_until = now + (float(retry_after) if retry_after.isdigit() else 1.0)
+            else:
+                reset = float(headers.get("X-RateLimit-Reset") or 0)
+                state.remaining = 0
+                # The reset time can already be in the past by the local clock; wait at least 1s regardless
+                state.blocked_until = max(reset, now + 1.0)
+        logging.info(f"Token {state.label} rate limited; parked for {state.blocked_until - now:.0f}s")
+
+    # --- Org access ---
+    def _check_org_access(self, state: TokenState, org: str) -> Optional[bool]:
+        """True/False once known; None if the probe was throttled or failed and has to be retried."""
+        if org in state.org_access:
+            return state.org_access[org]
+        if time.time() < state.blocked_until:
+            return None
+        response = metrics.http_get(
+            f"{self.base_url}/orgs/{org}", session=self.session, headers=self.headers_for(state)
+        )
+        self.update_from_headers(state, response.headers)
+        if response.status_code == 401:
+            self.quarantine(state, response.status_code)
+            return False
+        if self._is_rate_limited(response):
+            self.throttle(state, response.headers)
+            return None
+        if response.status_code not in (200, 404):
+            # 5xx and other transient answers: back off briefly and probe again
+            with self._lock:
+                state.blocked_until = time.time() + 1.0
+            return None
+        allowed = response.status_code == 200
+        state.org_access[org] = allowed
+        if not allowed:
+            logging.info(f"Token {state.label} has no access to org '{org}' ({response.status_code})")
+        return allowed
+
+    # --- Selection ---
+    def _candidates(self, org: Optional[str]) -> List[TokenState]:
+        now = time.time()
+        live = [s for s in self.states if s.quarantined_until <= now]
+        if org:
+            # Tokens whose probe is pending stay in; they are parked, so acquire() waits for them
+            live = [s for s in live if self._check_org_access(s, org) is not False]
+        return live
+
+    def acquire(self, org: Optional[str] = None) -> TokenState:
+        """Returns the usable token with the most remaining budget, waiting for a reset if all are spent."""
+        while True:
+            candidates = self._candidates(org)
+            if not candidates:
+                raise ValueError(f"No usable token for {self.base_url}" + (f" with access to org '{org}'" if org else ""))
+            for state in candidates:
+                if state.client is not None:
+                    remaining, _ = state.client.rate_limiting
+                    state.remaining = remaining
+                    state.reset_at = float(state.client.rate_limiting_resettime)
+            now = time.time()
+            best = max(candidates, key=lambda s: s.headroom(now))
+            if best.headroom(now) > 0:
+                return best
+            wait = max(min(s.ready_at(now) for s in candidates) - now, 1.0)
+            logging.warning(f"All tokens for {self.base_url} exhausted; sleeping {wait:.0f}s until reset")
+            metrics.timing("api.throttle_wait", wait * 1000, host=self.base_url)
+            time.sleep(wait)
+
+    def headers_for(self, state: TokenState) -> Dict[str, str]:
+        return {
+            "Authorization": f"{self.auth_scheme} {state.token}",
+            "Accept": "application/vnd.github+json",
+        }
+
+    # --- requests-based scripts ---
+    def request(self, method: str, url: str, org: Optional[str] = None, **kwargs) -> requests.Response:
+        """
+        Sends a request with the best token. A throttled token is parked and the
+        request retried on another one (or after waiting for a reset), so a
+        rate-limited response is never returned; a revoked token is retried up to
+        MAX_ATTEMPTS times.
+        """
+        extra_headers = kwargs.pop("headers", {})
+        auth_failures = 0
+        while True:
+            state = self.acquire(org)
+            headers = {**self.headers_for(state), **extra_headers}
+            response = metrics.http_request(method, url, session=self.session, headers=headers, **kwargs)
+            self.update_from_headers(state, response.headers)
+            if self._is_rate_limited(response):
+                self.throttle(state, response.headers)
+                metrics.incr("api.retries", host=self.base_url)
+                continue
+            if response.status_code == 401:
+                self.quarantine(state, response.status_code)
+                auth_failures += 1
+                if auth_failures < MAX_ATTEMPTS:
+                    metrics.incr("api.retries", host=self.base_url)
+                    continue
+            return response
+
+    def get(self, url: str, org: Optional[str] = None, **kwargs) -> requests.Response:
+        return self.request("GET", url, org=org, **kwargs)
+
+    # --- PyGithub-based scripts ---
+    def github(self, org: Optional[str] = None):
+        """Returns a PyGithub client bound to the token with the most headroom for this org."""
+        from github import Github, Auth
+
+        state = self.acquire(org)
+        if state.client is None:
+            metrics.instrument_pygithub()
+            state.client = Github(base_url=self.base_url, auth=Auth.Token(state.token))
+        return state.client
+
+    def report_error(self, client, exc: Exception) -> None:
+        """Quarantines the token behind a PyGithub client that raised a 401 (403s are per-resource)."""
+        status = getattr(exc, "status", None)
+        if status != 401:
+            return
+        for state in self.states:
+            if state.client is client:
+                self.quarantine(state, status)
@@ -0,0 +1,147 @@
+"""
+Streaming input stage shared by the URL-list scripts.
+
+Rows are read one at a time, each URL is reduced to a canonical host/org/repo
+key, and rows whose key was already seen are dropped before they reach the scan.
+These spellings are all the same repo:
+
+    https://ghes.example.com/Org/Repo
+    https://ghes.example.com/org/repo.git
+    https://<token>@ghes.example.com/org/repo.wiki.git
+    git@ghes.example.com:org/repo.git
+    ssh://git@ghes.example.com:22/org/repo.git
+
+The key is only used for dedup; the first spelling seen is passed on unchanged,
+so tokens and ssh users in the input still reach git.
+
+The seen-set keeps one 64-bit fingerprint per repo in an open-addressing array
+(12-23 bytes per repo depending on fill), so a million distinct repos take about
+16 MB, and the first URL is handed to the scanner as soon as it is read.
+"""
+
+import csv
+import hashlib
+import logging
+from array import array
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import metrics
+
+T = TypeVar("T")
+
+REPO_SUFFIXES = (".wiki.git", ".git", ".wiki")
+# http, https and ssh defaults: the same repo over any of them gets one key
+DEFAULT_PORTS = (80, 443, 22)
+
+
+def canonical_key(url: str) -> Optional[str]:
+    """host/org/repo in lower case, or None if the URL doesn't name a repo."""
+    url = url.strip()
+    if not url:
+        return None
+    if "://" not in url and "@" in url and ":" in url:
+        # scp-style ssh: git@host:org/repo.git
+        user_host, path = url.split(":", 1)
+        host = user_host.rsplit("@", 1)[-1]
+    else:
+        parts = urlsplit(url if "://" in url else f"https://{url}")
+        host = parts.hostname or ""
+        if parts.port and parts.port not in DEFAULT_PORTS:
+            host = f"{host}:{parts.port}"
+        path = parts.path
+    segments = [s for s in path.strip("/").split("/") if s]
+    if not host or len(segments) < 2:
+        return None
+    org, repo = segments[0], segments[1]
+    for suffix in REPO_SUFFIXES:
+        if repo.lower().endswith(suffix):
+            repo = repo[: -len(suffix)]
+            break
+    return f"{host}/{org}/{repo}".lower() if repo else None
+
+
+class SeenSet:
+    """Set of 64-bit fingerprints in a flat open-addressing table (0 marks an empty slot)."""
+
+    MAX_LOAD = 0.7
+
+    def __init__(self, capacity: int = 1 << 16) -> None:
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._slots = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self.count = 0
+
+    @staticmethod
+    def fingerprint(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def add(self, key: str) -> bool:
+        """Adds key; returns False if it was already present."""
+        fp = self.fingerprint(key)
+        slots, mask = self._slots, self._mask
+        i = fp & mask
+        while slots[i]:
+            if slots[i] == fp:
+                return False
+            i = (i + 1) & mask
+        slots[i] = fp
+        self.count += 1
+        if self.count > self.MAX_LOAD * len(slots):
+            self._grow()
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        fp = self.fingerprint(key)
+        i = fp & self._mask
+        while self._slots[i]:
+            if self._slots[i] == fp:
+                return True
+            i = (i + 1) & self._mask
+        return False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _grow(self) -> None:
+        old = self._slots
+        self._slots = array("Q", bytes(16 * len(old)))
+        self._mask = len(self._slots) - 1
+        for fp in old:
+            if fp:
+                i = fp & self._mask
+                while self._slots[i]:
+                    i = (i + 1) & self._mask
+                self._slots[i] = fp
+
+
+def unique(items: Iterable[T], url_of: Callable[[T], str] = lambda item: item, label: str = "input") -> Iterator[T]:
+    """Yields items whose URL names a repo not seen before; invalid URLs are passed through unchanged."""
+    seen = SeenSet()
+    duplicates = 0
+    for item in items:
+        key = canonical_key(url_of(item))
+        if key is not None and not seen.add(key):
+            duplicates += 1
+            continue
+        yield item
+    metrics.incr("input.duplicates", duplicates, source=label)
+    if duplicates:
+        logging.info(f"{label}: skipped {duplicates} duplicate repo URL(s); {len(seen)} unique")
+
+
+def read_url_column(path: str, skip_header: bool = False) -> Iterator[str]:
+    """Streams the first column of a CSV as written (credentials included), blanks skipped."""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        if skip_header:
+            next(reader, None)
+        for row in reader:
+            if row and row[0].strip():
+                yield row[0].strip()
+
+
+def unique_urls(path: str, skip_header: bool = False) -> Iterator[str]:
+    return unique(read_url_column(path, skip_header), label=path)
@@ -0,0 +1,260 @@
+"""
+Migration wave planner.
+
+Turns the size reports (repo_size_report_<org>.csv from size.py, or one merged
+report from `report_sink.py merge`) and the org reclassification
+(reclassified_orgs.csv from complexity_eval.py / agg.txt) into a schedule of
+waves. Each wave is filled first-fit-decreasing until its estimated duration
+(transfer volume at WAVE_BANDWIDTH_MB_S plus per-repo overhead spread over
+MIGRATION_CONCURRENCY parallel migrations) reaches WAVE_WINDOW_HOURS, and it
+never holds more than WAVE_MAX_REPOS repos.
+
+Dependencies:
+- orgs linked by a fork network (--forks CSV with fork_org,parent_org) are
+  placed in the same wave, so parents and forks land together;
+- orgs classified "Still Complex" (a hard-stop blocker) are never scheduled,
+  and neither is anything in their fork network.
+
+Transfer volume uses the measured pack size when --pack-sizes gives one
+(org,repo,pack_size_mb), otherwise the repo size from the size report.
+
+    python wave_planner.py reports/repo_size_report_*.csv --reclassified reclassified_orgs.csv
+"""
+
+import os
+import re
+import sys
+import argparse
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from complexity_eval import STILL_COMPLEX
+from report_sink import ReportWriter, expand_inputs, iter_rows, report_path
+
+# --- Config ---
+WAVE_BANDWIDTH_MB_S: float = float(os.getenv("WAVE_BANDWIDTH_MB_S", "100"))  # MB/s across the whole pipeline
+WAVE_WINDOW_HOURS: float = float(os.getenv("WAVE_WINDOW_HOURS", "8"))
+WAVE_MAX_REPOS: int = int(os.getenv("WAVE_MAX_REPOS", "500"))
+PER_REPO_OVERHEAD_SECONDS: float = float(os.getenv("PER_REPO_OVERHEAD_SECONDS", "30"))
+MIGRATION_CONCURRENCY: int = int(os.getenv("MIGRATION_CONCURRENCY", "10"))
+OUTPUT_CSV: str = os.getenv("WAVE_PLAN_CSV", "migration_waves.csv")
+
+SIZE_REPORT_NAME = re.compile(r"repo_size_report_(.+)\.(?:csv|parquet)$")
+
+
+def estimate_seconds(transfer_mb: float, repos: int, bandwidth_mb_s: float, concurrency: int) -> float:
+    # Bytes move at the shared bandwidth; per-repo setup overlaps across concurrent migrations
+    return transfer_mb / bandwidth_mb_s + repos * PER_REPO_OVERHEAD_SECONDS / max(concurrency, 1)
+
+
+class OrgLoad:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.repos = 0
+        self.transfer_mb = 0.0
+        self.unknown_size = 0  # repos whose size check failed
+        self.classification = ""
+
+
+class Unit:
+    """A fork network (or a single org) that has to be scheduled as one piece."""
+
+    def __init__(self, orgs: List[OrgLoad]) -> None:
+        self.orgs = sorted(orgs, key=lambda org: org.name)
+        self.repos = sum(org.repos for org in orgs)
+        self.transfer_mb = sum(org.transfer_mb for org in orgs)
+        self.blocked_by = [org.name for org in orgs if org.classification == STILL_COMPLEX]
+
+    @property
+    def label(self) -> str:
+        return self.orgs[0].name if len(self.orgs) == 1 else f"{self.orgs[0].name}+{len(self.orgs) - 1}"
+
+
+class Wave:
+    def __init__(self, number: int) -> None:
+        self.number = number
+        self.units: List[Unit] = []
+        self.repos = 0
+        self.transfer_mb = 0.0
+
+    def fits(self, unit: Unit, window_seconds: float, max_repos: int, bandwidth_mb_s: float, concurrency: int) -> bool:
+        if self.repos + unit.repos > max_repos:
+            return False
+        seconds = estimate_seconds(self.transfer_mb + unit.transfer_mb, self.repos + unit.repos, bandwidth_mb_s, concurrency)
+        return seconds <= window_seconds
+
+    def add(self, unit: Unit) -> None:
+        self.units.append(unit)
+        self.repos += unit.repos
+        self.transfer_mb += unit.transfer_mb
+
+
+# --- Inputs ---
+def org_for_report(path: str, row: Dict[str, str]) -> Optional[str]:
+    """An explicit org column, else the report name (or a merged report's source_report column)."""
+    if row.get("org"):
+        return row["org"]
+    match = SIZE_REPORT_NAME.search(row.get("source_report") or os.path.basename(path))
+    return match.group(1) if match else None
+
+
+def load_pack_sizes(path: Optional[str]) -> Dict[Tuple[str, str], float]:
+    if not path:
+        return {}
+    return {
+        (row["org"], row["repo"]): float(row["pack_size_mb"])
+        for row in iter_rows(path)
+        if row.get("pack_size_mb")
+    }
+
+
+def load_org_loads(size_reports: Iterable[str], pack_sizes: Dict[Tuple[str, str], float]) -> Dict[str, OrgLoad]:
+    orgs: Dict[str, OrgLoad] = {}
+    for path in size_reports:
+        for row in iter_rows(path):
+            org_name = org_for_report(path, row)
+            if not org_name:
+                print(f"⚠️ Can't tell which org {path} belongs to; skipping", file=sys.stderr)
+                break
+            org = orgs.setdefault(org_name, OrgLoad(org_name))
+            org.repos += 1
+            size = pack_sizes.get((org_name, row["Repository"]))
+            if size is None:
+                if row.get("Preflight Check Result") == "Fail":
+                    org.unknown_size += 1
+                    continue
+                size = float(row.get("Size (MB)") or 0)
+            org.transfer_mb += size
+    return orgs
+
+
+def load_classifications(path: Optional[str], orgs: Dict[str, OrgLoad]) -> None:
+    if not path:
+        return
+    for row in iter_rows(path):
+        org = orgs.get(row["org_name"])
+        if org:
+            org.classification = row.get("final_classification", "")
+
+
+def load_fork_edges(path: Optional[str]) -> List[Tuple[str, str]]:
+    if not path:
+        return []
+    return [(row["fork_org"], row["parent_org"]) for row in iter_rows(path)]
+
+
+# --- Planning ---
+def group_units(orgs: Dict[str, OrgLoad], fork_edges: List[Tuple[str, str]]) -> List[Unit]:
+    """Union-find over fork edges; every connected fork network becomes one unit."""
+    parent = {name: name for name in orgs}
+
+    def find(name: str) -> str:
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    for fork_org, parent_org in fork_edges:
+        if fork_org in parent and parent_org in parent:
+            parent[find(fork_org)] = find(parent_org)
+
+    networks: Dict[str, List[OrgLoad]] = {}
+    for name, org in orgs.items():
+        networks.setdefault(find(name), []).append(org)
+    return [Unit(members) for members in networks.values()]
+
+
+def plan_waves(
+    units: List[Unit], window_seconds: float, max_repos: int, bandwidth_mb_s: float, concurrency: int
+) -> Tuple[List[Wave], List[Unit]]:
+    """First-fit-decreasing on estimated duration; returns (waves, blocked units)."""
+    blocked = [unit for unit in units if unit.blocked_by]
+    schedulable = sorted(
+        (unit for unit in units if not unit.blocked_by),
+        key=lambda unit: (estimate_seconds(unit.transfer_mb, unit.repos, bandwidth_mb_s, concurrency), unit.repos),
+        reverse=True,
+    )
+    waves: List[Wave] = []
+    for unit in schedulable:
+        wave = next((w for w in waves if w.fits(unit, window_seconds, max_repos, bandwidth_mb_s, concurrency)), None)
+        if wave is None:
+            # A unit larger than the budget still gets a wave of its own
+            wave = Wave(len(waves) + 1)
+            waves.append(wave)
+        wave.add(unit)
+    return waves, blocked
+
+
+# --- Output ---
+def write_plan(path: str, waves: List[Wave], blocked: List[Unit], bandwidth_mb_s: float, concurrency: int) -> None:
+    fieldnames = ["wave", "org_name", "fork_network", "repos", "transfer_mb", "unknown_size_repos", "est_hours", "note"]
+    with ReportWriter(path, fieldnames) as report:
+        for wave in waves:
+            for unit in wave.units:
+                for org in unit.orgs:
+                    report.write({
+                        "wave": wave.number,
+                        "org_name": org.name,
+                        "fork_network": unit.label,
+                        "repos": org.repos,
+                        "transfer_mb": round(org.transfer_mb, 2),
+                        "unknown_size_repos": org.unknown_size,
+                        "est_hours": round(estimate_seconds(org.transfer_mb, org.repos, bandwidth_mb_s, concurrency) / 3600, 2),
+                        "note": "",
+                    })
+        for unit in blocked:
+            for org in unit.orgs:
+                report.write({
+                    "wave": "",
+                    "org_name": org.name,
+                    "fork_network": unit.label,
+                    "repos": org.repos,
+                    "transfer_mb": round(org.transfer_mb, 2),
+                    "unknown_size_repos": org.unknown_size,
+                    "est_hours": "",
+                    "note": f"blocked: hard-stop in {', '.join(unit.blocked_by)}",
+                })
+
+
+def print_summary(waves: List[Wave], blocked: List[Unit], window_seconds: float, bandwidth_mb_s: float, concurrency: int) -> None:
+    print(f"{'wave':>4} {'orgs':>5} {'repos':>6} {'transfer GB':>12} {'fill':>6} {'est hours':>10}")
+    for wave in waves:
+        orgs = sum(len(unit.orgs) for unit in wave.units)
+        seconds = estimate_seconds(wave.transfer_mb, wave.repos, bandwidth_mb_s, concurrency)
+        hours = seconds / 3600
+        fill = seconds / window_seconds * 100 if window_seconds else 0.0
+        print(f"{wave.number:>4} {orgs:>5} {wave.repos:>6} {wave.transfer_mb / 1024:>12.1f} {fill:>5.0f}% {hours:>10.1f}")
+    if blocked:
+        blocked_orgs = sum(len(unit.orgs) for unit in blocked)
+        print(f"\n⛔ {blocked_orgs} org(s) in {len(blocked)} fork network(s) held back by hard-stop blockers")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pack orgs into migration waves by transfer volume")
+    parser.add_argument("size_reports", nargs="+", help="repo_size_report_<org>.csv files, globs or a merged report")
+    parser.add_argument("--reclassified", help="reclassified_orgs.csv (orgs marked Still Complex are held back)")
+    parser.add_argument("--pack-sizes", help="CSV with org,repo,pack_size_mb measured pack sizes")
+    parser.add_argument("--forks", help="CSV with fork_org,parent_org fork-network edges")
+    parser.add_argument("--bandwidth-mb-s", type=float, default=WAVE_BANDWIDTH_MB_S, help="megabytes (not megabits) per second")
+    parser.add_argument("--window-hours", type=float, default=WAVE_WINDOW_HOURS)
+    parser.add_argument("--max-repos", type=int, default=WAVE_MAX_REPOS, help="repos in flight per wave")
+    parser.add_argument("--concurrency", type=int, default=MIGRATION_CONCURRENCY, help="parallel repo migrations")
+    parser.add_argument("-o", "--output", default=OUTPUT_CSV)
+    args = parser.parse_args()
+
+    orgs = load_org_loads(expand_inputs(args.size_reports), load_pack_sizes(args.pack_sizes))
+    load_classifications(args.reclassified, orgs)
+    units = group_units(orgs, load_fork_edges(args.forks))
+
+    window_seconds = args.window_hours * 3600
+    waves, blocked = plan_waves(units, window_seconds, args.max_repos, args.bandwidth_mb_s, args.concurrency)
+
+    output = report_path(args.output)
+    write_plan(output, waves, blocked, args.bandwidth_mb_s, args.concurrency)
+    print_summary(waves, blocked, window_seconds, args.bandwidth_mb_s, args.concurrency)
+    scheduled = sum(len(unit.orgs) for wave in waves for unit in wave.units)
+    held_back = sum(len(unit.orgs) for unit in blocked)
+    print(f"\n✅ {scheduled} org(s) planned into {len(waves)} wave(s), {held_back} held back: {output}")
+
+
+if __name__ == "__main__":
+    main()
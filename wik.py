@@ -1,32 +1,33 @@
 import os
 import time
-import requests
-import pandas as pd
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin
 from dotenv import load_dotenv
+import metrics
+from report_sink import ReportWriter, report_path
+from url_input import unique_urls
 
 # Load token
 load_dotenv()
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
-    raise ValueError("❌ GITHUB_TOKEN not found in .env")
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")  # checked in main()
 
 # Config
 INPUT_CSV = 'input.csv'
 OUTPUT_CSV = 'output_with_api_and_attachments.csv'
+REPORT_FIELDS = ["orgname", "reponame", "wiki_url", "has_wiki", "has_attachments", "attachment_urls",
+                 "attachment_count", "attachment_bytes"]
 DELAY_BETWEEN_REQUESTS = 0.5
+# sync: one request at a time with fixed delays; async: concurrent crawl with adaptive pacing (wiki_crawl.py)
+WIKI_ENGINE = os.getenv("WIKI_ENGINE", "sync").lower()
 VERIFY_SSL = False  # For self-signed GHE certs
 
-API_BASE = "https://github-test.qualcomm.com/api/v3"
+WEB_BASE = os.getenv("GHES_WEB_URL", "https://github-test.qualcomm.com")
+API_BASE = os.getenv("GHES_API_URL", f"{WEB_BASE}/api/v3")
 
 HEADERS = {
     "Authorization": f"Bearer {GITHUB_TOKEN}",
     "Accept": "application/vnd.github+json"
 }
 
-requests.packages.urllib3.disable_warnings()
-
 
 def extract_org_repo(url):
     parts = urlparse(url).path.strip('/').split('/')
@@ -35,7 +36,7 @@ def extract_org_repo(url):
 
 def get_has_wiki(org, repo):
     api_url = f"{API_BASE}/repos/{org}/{repo}"
-    response = requests.get(api_url, headers=HEADERS, verify=VERIFY_SSL)
+    response = metrics.http_get(api_url, headers=HEADERS, verify=VERIFY_SSL)
     if response.status_code != 200:
         print(f"❌ API error: {org}/{repo} (status {response.status_code})")
         return False
@@ -45,10 +46,12 @@ def get_has_wiki(org, repo):
 def get_all_wiki_pages(wiki_home_url):
     try:
         pages_url = urljoin(wiki_home_url, '_pages')
-        response = requests.get(pages_url, headers=HEADERS, timeout=10, verify=VERIFY_SSL)
+        response = metrics.http_get(pages_url, headers=HEADERS, timeout=10, verify=VERIFY_SSL)
         if response.status_code != 200:
             return []
 
+        from bs4 import BeautifulSoup  # sync engine only
+
         soup = BeautifulSoup(response.text, 'html.parser')
         page_urls = []
         for link in soup.find_all('a', href=True):
@@ -63,9 +66,11 @@ def get_all_wiki_pages(wiki_home_url):
 
 def get_attachments_from_page(page_url):
     try:
-        response = requests.get(page_url, headers=HEADERS, timeout=10, verify=VERIFY_SSL)
+        response = metrics.http_get(page_url, headers=HEADERS, timeout=10, verify=VERIFY_SSL)
         if response.status_code != 200:
             return []
+        from bs4 import BeautifulSoup  # sync engine only
+
         soup = BeautifulSoup(response.text, 'html.parser')
         attachments = []
         for tag in soup.find_all(['a', 'img'], href=True):
@@ -77,48 +82,68 @@ def get_attachments_from_page(page_url):
         return []
 
 
-def main():
-    df = pd.read_csv(INPUT_CSV)
-    results = []
-
-    for url in df.iloc[:, 0]:
+def iter_repos(urls):
+    for url in urls:
         org, repo = extract_org_repo(url)
         if not repo:
             print(f"⚠️ Invalid repo URL: {url}")
             continue
+        yield org, repo, url
 
-        print(f"\n🔍 Checking {org}/{repo}")
-        has_wiki = get_has_wiki(org, repo)
-        has_attachments = False
-        attachment_urls = []
 
-        if has_wiki:
-            wiki_home = f"https://github-test.qualcomm.com/{org}/{repo}/wiki/"
-            all_pages = get_all_wiki_pages(wiki_home)
-            if wiki_home not in all_pages:
-                all_pages.insert(0, wiki_home)
-
-            for page in all_pages:
-                time.sleep(DELAY_BETWEEN_REQUESTS)
-                attachments = get_attachments_from_page(page)
-                if attachments:
-                    has_attachments = True
-                    attachment_urls.extend(attachments)
-
-        results.append({
-            "orgname": org,
-            "reponame": repo,
-            "wiki_url": url,
-            "has_wiki": has_wiki,
-            "has_attachments": has_attachments,
-            "attachment_urls": ", ".join(list(set(attachment_urls)))
-        })
-
-        time.sleep(DELAY_BETWEEN_REQUESTS)
-
-    pd.DataFrame(results).to_csv(OUTPUT_CSV, index=False)
-    print(f"\n✅ Done! Results saved to {OUTPUT_CSV}")
+def main():
+    import requests
+
+    if not GITHUB_TOKEN:
+        raise ValueError("❌ GITHUB_TOKEN not found in .env")
+    requests.packages.urllib3.disable_warnings()
+    output = report_path(OUTPUT_CSV)
+
+    with ReportWriter(output, REPORT_FIELDS) as report:
+        if WIKI_ENGINE == "async":
+            from wiki_crawl import crawl
+
+            crawl(iter_repos(unique_urls(INPUT_CSV, skip_header=True)), report.write, HEADERS, WEB_BASE, API_BASE, verify_ssl=VERIFY_SSL)
+            print(f"\n✅ Done! Results saved to {output}")
+            return
+
+        for org, repo, url in iter_repos(unique_urls(INPUT_CSV, skip_header=True)):
+            print(f"\n🔍 Checking {org}/{repo}")
+            has_wiki = get_has_wiki(org, repo)
+            has_attachments = False
+            attachment_urls = []
+
+            if has_wiki:
+                wiki_home = f"{WEB_BASE}/{org}/{repo}/wiki/"
+                all_pages = get_all_wiki_pages(wiki_home)
+                if wiki_home not in all_pages:
+                    all_pages.insert(0, wiki_home)
+
+                metrics.incr("wiki.pages", len(all_pages))
+                for page in all_pages:
+                    with metrics.timer("wiki.pacing_wait"):
+                        time.sleep(DELAY_BETWEEN_REQUESTS)
+                    with metrics.stage("wiki_page", repo=f"{org}/{repo}"):
+                        attachments = get_attachments_from_page(page)
+                    if attachments:
+                        has_attachments = True
+                        attachment_urls.extend(attachments)
+
+            report.write({
+                "orgname": org,
+                "reponame": repo,
+                "wiki_url": url,
+                "has_wiki": has_wiki,
+                "has_attachments": has_attachments,
+                "attachment_urls": ", ".join(list(set(attachment_urls))),
+                "attachment_count": len(set(attachment_urls)),
+                "attachment_bytes": ""  # only measured by the async engine
+            })
+
+            time.sleep(DELAY_BETWEEN_REQUESTS)
+
+    print(f"\n✅ Done! Results saved to {output}")
 
 
 if __name__ == "__main__":
-    main()
+    metrics.run_main(main)
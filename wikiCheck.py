@@ -1,29 +1,42 @@
 import os
 import subprocess
 import shutil
-import csv
+import time
+import metrics
+from report_sink import ReportWriter, report_path
+from scan_cache import cached_scan
+from url_input import unique_urls
 
 # CONFIG
 INPUT_CSV = 'input.csv'  # list of GitHub repo URLs (one per line)
 OUTPUT_CSV = 'wiki_git_attachment_results.csv'
 TMP_DIR = 'tmp_wiki_clones'
+REPORT_FIELDS = ['repo_url', 'has_attachments']
 
 # File extensions considered "attachments"
 ATTACHMENT_EXTS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.zip', '.pdf', '.pptx', '.docx'}
+# Bump when the scan logic changes so cached results are not reused
+CHECK_VERSION = "1:" + ",".join(sorted(ATTACHMENT_EXTS))
 
 def has_attachments(path):
-    for root, _, files in os.walk(path):
-        for f in files:
-            ext = os.path.splitext(f)[1].lower()
-            if ext in ATTACHMENT_EXTS:
-                return True
-            # Also check if markdown links to /wiki-attachment/
-            if ext in ['.md', '.markdown', '.txt']:
-                with open(os.path.join(root, f), 'r', encoding='utf-8', errors='ignore') as file:
-                    content = file.read()
-                    if 'wiki-attachment/' in content:
-                        return True
-    return False
+    start = time.perf_counter()
+    files_seen = 0
+    try:
+        for root, _, files in os.walk(path):
+            for f in files:
+                files_seen += 1
+                ext = os.path.splitext(f)[1].lower()
+                if ext in ATTACHMENT_EXTS:
+                    return True
+                # Also check if markdown links to /wiki-attachment/
+                if ext in ['.md', '.markdown', '.txt']:
+                    with open(os.path.join(root, f), 'r', encoding='utf-8', errors='ignore') as file:
+                        content = file.read()
+                        if 'wiki-attachment/' in content:
+                            return True
+        return False
+    finally:
+        metrics.record_scan(files_seen, time.perf_counter() - start, check="wiki")
 
 def clone_and_check(url):
     try:
@@ -33,9 +46,12 @@ def clone_and_check(url):
         repo_name = url.strip().split('/')[-1].replace('.wiki.git', '')
         clone_path = os.path.join(TMP_DIR, repo_name)
 
+        start = time.perf_counter()
         subprocess.run(['git', 'clone', '--quiet', url, clone_path], check=True)
+        metrics.record_clone(clone_path, time.perf_counter() - start, check="wiki", repo=url)
         return has_attachments(clone_path)
     except subprocess.CalledProcessError:
+        metrics.incr("clone.failed", check="wiki")
         print(f"[!] Failed to clone: {url}")
         return None
     finally:
@@ -43,29 +59,29 @@ def clone_and_check(url):
         if os.path.exists(clone_path):
             shutil.rmtree(clone_path)
 
+def iter_tasks():
+    for base_url in unique_urls(INPUT_CSV):
+        yield {'base_url': base_url}
+
+def check_url(base_url):
+    print(f"🔍 Cloning: {base_url}")
+    with metrics.stage("repo_total", check="wiki", repo=base_url):
+        wiki_url = base_url if base_url.endswith('.wiki.git') else base_url + '.wiki.git'
+        result = cached_scan(base_url, "wiki", CHECK_VERSION, lambda: clone_and_check(base_url), remote_url=wiki_url)
+    return {
+        'repo_url': base_url,
+        'has_attachments': result if result is not None else 'clone_failed'
+    }
+
 def main():
     os.makedirs(TMP_DIR, exist_ok=True)
-    results = []
-
-    with open(INPUT_CSV, newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            if not row:
-                continue
-            base_url = row[0].strip()
-            print(f"🔍 Cloning: {base_url}")
-            result = clone_and_check(base_url)
-            results.append({
-                'repo_url': base_url,
-                'has_attachments': result if result is not None else 'clone_failed'
-            })
+    output = report_path(OUTPUT_CSV)
 
-    with open(OUTPUT_CSV, 'w', newline='') as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=['repo_url', 'has_attachments'])
-        writer.writeheader()
-        writer.writerows(results)
+    with ReportWriter(output, REPORT_FIELDS) as report:
+        for task in iter_tasks():
+            report.write(check_url(**task))
 
-    print(f"\n✅ Done! Results saved to: {OUTPUT_CSV}")
+    print(f"\n✅ Done! Results saved to: {output}")
 
 if __name__ == '__main__':
-    main()
+    metrics.run_main(main)
@@ -0,0 +1,292 @@
+"""
+Async wiki crawler for instances where wiki git access is blocked (used by wik.py
+when WIKI_ENGINE=async).
+
+- Requests go through aiohttp. Each host has its own concurrency limit
+  (WIKI_HOST_CONCURRENCY) and an adaptive pacer instead of a fixed sleep. The
+  gap between request starts doubles when the host throttles (429, rate-limited
+  403, 5xx, Retry-After) and shrinks again as responses succeed.
+- Page HTML is parsed in a process pool so parsing never stalls the event loop.
+  lxml is used when installed, otherwise the stdlib HTMLParser.
+- Attachments are sized with concurrent HEAD requests, so every wiki row also
+  gets attachment_count and attachment_bytes.
+- WIKI_CRAWL_REPOS repos are crawled at once, pulled lazily from the input.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import metrics
+
+# --- Config ---
+HOST_CONCURRENCY: int = int(os.getenv("WIKI_HOST_CONCURRENCY", "8"))
+CRAWL_REPOS: int = int(os.getenv("WIKI_CRAWL_REPOS", "16"))
+PARSE_PROCESSES: int = int(os.getenv("WIKI_PARSE_PROCESSES", str(os.cpu_count() or 2)))
+MIN_DELAY: float = float(os.getenv("WIKI_MIN_DELAY", "0"))
+MAX_DELAY: float = float(os.getenv("WIKI_MAX_DELAY", "30"))
+REQUEST_TIMEOUT: float = float(os.getenv("WIKI_REQUEST_TIMEOUT", "10"))
+MAX_ATTEMPTS: int = 4
+
+UPLOADS_MARKER = "/wiki/uploads/"
+
+
+# --- Parsing (runs in worker processes) ---
+class _LinkParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in ("a", "img"):
+            for name, value in attrs:
+                if name in ("href", "src") and value:
+                    self.links.append(value)
+
+
+def extract_links(html: str) -> List[str]:
+    """Every a[href] / img[src] in the page."""
+    try:
+        import lxml.html
+    except ImportError:
+        parser = _LinkParser()
+        parser.feed(html)
+        return parser.links
+    try:
+        root = lxml.html.fromstring(html)
+    except Exception:  # lxml rejects empty documents
+        return []
+    return [link for element, attr, link, _ in root.iterlinks() if element.tag in ("a", "img") and attr in ("href", "src")]
+
+
+def parse_page_list(html: str, pages_url: str) -> List[str]:
+    links = (urljoin(pages_url, href) for href in extract_links(html))
+    return sorted({link for link in links if "/wiki/" in link and not link.endswith("/_pages") and UPLOADS_MARKER not in link})
+
+
+def parse_attachments(html: str, page_url: str) -> List[str]:
+    return sorted({urljoin(page_url, href) for href in extract_links(html) if UPLOADS_MARKER in href})
+
+
+# --- Pacing ---
+class AdaptivePacer:
+    """Spaces request starts on one host; backs off on throttling, speeds up on success."""
+
+    def __init__(self, min_delay: float = MIN_DELAY, max_delay: float = MAX_DELAY) -> None:
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = min_delay
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            pause = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.delay
+        if pause > 0:
+            with metrics.timer("wiki.pacing_wait"):
+                await asyncio.sleep(pause)
+
+    def success(self) -> None:
+        # Decay back to the floor; below 10ms the gap is noise, so drop straight to it
+        self.delay = self.delay * 0.8 if self.delay * 0.8 > max(self.min_delay, 0.01) else self.min_delay
+
+    def throttled(self, retry_after: Optional[float] = None) -> None:
+        self.delay = min(self.max_delay, max(self.delay * 2, 0.25, retry_after or 0))
+        # Nobody starts before the host said it would accept requests again
+        self._next_start = max(self._next_start, time.monotonic() + (retry_after or self.delay))
+        logging.info(f"Host throttling; pacing now {self.delay:.2f}s between requests")
+
+
+def _is_throttled(status: int, headers) -> bool:
+    if status == 429 or status >= 500:
+        return True
+    return status == 403 and (headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in headers)
+
+
+class HostClient:
+    """aiohttp session with a per-host semaphore and pacer."""
+
+    def __init__(self, session, headers: Dict[str, str], verify_ssl: bool = True, per_host: int = HOST_CONCURRENCY) -> None:
+        self.session = session
+        self.headers = headers
+        self.ssl = None if verify_ssl else False
+        self.per_host = per_host
+        self._hosts: Dict[str, Tuple[asyncio.Semaphore, AdaptivePacer]] = {}
+
+    def _host(self, url: str) -> Tuple[asyncio.Semaphore, AdaptivePacer]:
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = (asyncio.Semaphore(self.per_host), AdaptivePacer())
+        return self._hosts[host]
+
+    async def request(self, method: str, url: str) -> Tuple[int, Dict[str, str], str]:
+        """Returns (status, headers, text); text is empty for HEAD. Status 0 means the request failed."""
+        import aiohttp
+
+        semaphore, pacer = self._host(url)
+        host = urlparse(url).hostname
+        status, headers, text = 0, {}, ""
+        for _ in range(MAX_ATTEMPTS):
+            # Pace before taking a slot, so a throttled host's wait doesn't hold a concurrency slot
+            await pacer.wait()
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    async with self.session.request(
+                        method, url, headers=self.headers, ssl=self.ssl, allow_redirects=True,
+                        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                    ) as response:
+                        status, headers = response.status, dict(response.headers)
+                        text = await response.text(errors="ignore") if method != "HEAD" else ""
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logging.warning(f"{method} {url} failed: {e}")
+                    status, headers, text = 0, {}, ""
+            metrics.histogram("api.latency", (time.perf_counter() - start) * 1000, host=host, method=method, status=status)
+            metrics.incr("api.requests", host=host, status=status)
+            if status and not _is_throttled(status, headers):
+                pacer.success()
+                return status, headers, text
+            metrics.incr("api.throttled" if status else "api.errors", host=host)
+            retry_after = headers.get("Retry-After")
+            pacer.throttled(float(retry_after) if retry_after and retry_after.isdigit() else None)
+        return status, headers, text
+
+
+# --- Crawl ---
+class WikiCrawler:
+    def __init__(self, client: HostClient, pool: ProcessPoolExecutor, web_base: str, api_base: str) -> None:
+        self.client = client
+        self.pool = pool
+        self.web_base = web_base.rstrip("/")
+        self.api_base = api_base.rstrip("/")
+
+    async def _parse(self, func, html: str, url: str) -> List[str]:
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, html, url)
+
+    async def has_wiki(self, org: str, repo: str) -> bool:
+        status, _, text = await self.client.request("GET", f"{self.api_base}/repos/{org}/{repo}")
+        if status != 200:
+            print(f"❌ API error: {org}/{repo} (status {status})")
+            return False
+        return bool(json.loads(text).get("has_wiki", False))
+
+    async def wiki_pages(self, wiki_home: str) -> List[str]:
+        pages_url = urljoin(wiki_home, "_pages")
+        status, _, text = await self.client.request("GET", pages_url)
+        pages = await self._parse(parse_page_list, text, pages_url) if status == 200 else []
+        if wiki_home not in pages:
+            pages.insert(0, wiki_home)
+        return pages
+
+    async def page_attachments(self, page_url: str) -> List[str]:
+        status, _, text = await self.client.request("GET", page_url)
+        if status != 200:
+            return []
+        return await self._parse(parse_attachments, text, page_url)
+
+    async def attachment_size(self, url: str) -> int:
+        status, headers, _ = await self.client.request("HEAD", url)
+        length = headers.get("Content-Length", "")
+        return int(length) if status == 200 and length.isdigit() else 0
+
+    async def crawl_repo(self, org: str, repo: str, url: str) -> Dict:
+        print(f"\n🔍 Checking {org}/{repo}")
+        has_wiki = await self.has_wiki(org, repo)
+        attachments: List[str] = []
+        sizes: List[int] = []
+        if has_wiki:
+            pages = await self.wiki_pages(f"{self.web_base}/{org}/{repo}/wiki/")
+            metrics.incr("wiki.pages", len(pages))
+            per_page = await asyncio.gather(*(self.page_attachments(page) for page in pages))
+            attachments = sorted({a for found in per_page for a in found})
+            sizes = await asyncio.gather(*(self.attachment_size(a) for a in attachments))
+            metrics.incr("wiki.attachment_bytes", sum(sizes))
+        return {
+            "orgname": org,
+            "reponame": repo,
+            "wiki_url": url,
+            "has_wiki": has_wiki,
+            "has_attachments": bool(attachments),
+            "attachment_urls": ", ".join(attachments),
+            "attachment_count": len(attachments),
+            "attachment_bytes": sum(sizes),
+        }
+
+
+def error_row(org: str, repo: str, url: str) -> Dict:
+    return {
+        "orgname": org,
+        "reponame": repo,
+        "wiki_url": url,
+        "has_wiki": "error",
+        "has_attachments": "",
+        "attachment_urls": "",
+        "attachment_count": "",
+        "attachment_bytes": "",
+    }
+
+
+async def _crawl(repos: Iterable[Tuple[str, str, str]], write, headers: Dict[str, str], web_base: str,
+                 api_base: str, verify_ssl: bool) -> int:
+    import aiohttp
+
+    done = 0
+    queue: asyncio.Queue = asyncio.Queue(maxsize=CRAWL_REPOS * 2)
+
+    async def worker(crawler: WikiCrawler) -> None:
+        nonlocal done
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            org, repo, url = item
+            try:
+                with metrics.stage("wiki_repo", repo=f"{org}/{repo}"):
+                    row = await crawler.crawl_repo(org, repo, url)
+            except Exception as e:
+                logging.error(f"Wiki crawl failed for {org}/{repo}: {e}")
+                metrics.incr("wiki.crawl_failed")
+                # The sync engine writes one row per repo; so does this one
+                row = error_row(org, repo, url)
+            try:
+                write(row)
+                done += 1
+            finally:
+                queue.task_done()
+
+    async def feed() -> None:
+        # Lazily: the input is never read further ahead than the queue allows
+        for item in repos:
+            await queue.put(item)
+        for _ in range(CRAWL_REPOS):
+            await queue.put(None)
+
+    connector = aiohttp.TCPConnector(limit=0)
+    with ProcessPoolExecutor(max_workers=PARSE_PROCESSES) as pool:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            crawler = WikiCrawler(HostClient(session, headers, verify_ssl), pool, web_base, api_base)
+            tasks = [asyncio.create_task(feed())] + [asyncio.create_task(worker(crawler)) for _ in range(CRAWL_REPOS)]
+            # If anything dies (e.g. the report write fails), stop everything instead of
+            # leaving the feeder blocked on a full queue
+            finished, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in finished:
+                task.result()
+    return done
+
+
+def crawl(repos: Iterable[Tuple[str, str, str]], write, headers: Dict[str, str], web_base: str, api_base: str,
+          verify_ssl: bool = True) -> int:
+    """Crawls (org, repo, url) triples, calling write(row) as each repo finishes; returns repos written."""
+    return asyncio.run(_crawl(repos, write, headers, web_base, api_base, verify_ssl))
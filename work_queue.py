@@ -0,0 +1,360 @@
+"""
+Shared work queue so one sweep can run on many worker processes and hosts.
+
+The coordinator lists the repos once and enqueues one task per repo. Workers
+lease a task, renew the lease from a heartbeat thread while the clone/scan runs,
+and mark it done with its report row. A lease that is not renewed (worker
+killed, host lost) expires and the task goes back to the queue. Finished rows
+live in the queue database, so `report` writes one report no matter how many
+workers produced it.
+
+    python work_queue.py enqueue binary             # coordinator: list repos once
+    python work_queue.py work binary --processes 4  # on every worker host
+    python work_queue.py status binary
+    python work_queue.py report binary              # -> binary_over_1mb_report.csv
+    python work_queue.py run wiki --processes 4     # all of the above on this host
+
+WORK_QUEUE_DB           SQLite file (default work_queue.sqlite)
+WORK_QUEUE_JOURNAL      wal (default): any number of processes on one host.
+                        delete: for a DB on shared storage used by several hosts;
+                        WAL needs shared memory and is unsafe over NFS/SMB.
+WORK_QUEUE_LEASE_SECONDS / WORK_QUEUE_MAX_ATTEMPTS tune leasing and retries.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import importlib
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import metrics
+from report_sink import ReportWriter, report_path
+
+# --- Config ---
+WORK_QUEUE_DB: str = os.getenv("WORK_QUEUE_DB", "work_queue.sqlite")
+WORK_QUEUE_JOURNAL: str = os.getenv("WORK_QUEUE_JOURNAL", "wal").lower()
+LEASE_SECONDS: float = float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS: int = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+IDLE_POLL_SECONDS: float = float(os.getenv("WORK_QUEUE_IDLE_POLL_SECONDS", "1"))
+WORK_DIR: str = os.getenv("WORK_QUEUE_WORK_DIR", "work_queue_scratch")
+
+# check name -> (module, task seed function, per-task function, payload field that identifies a task);
+# modules load only when used
+CHECKS: Dict[str, Tuple[str, str, str, str]] = {
+    "binary": ("Bin", "iter_tasks", "check_repo", "repo_url"),
+    "largefile": ("largefile400", "iter_tasks", "check_url", "url"),
+    "wiki": ("wikiCheck", "iter_tasks", "check_url", "base_url"),
+}
+
+
+class Task(NamedTuple):
+    id: int
+    key: str
+    payload: Dict
+    attempts: int
+
+
+class WorkQueue:
+    def __init__(self, path: str = WORK_QUEUE_DB) -> None:
+        self.path = path
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if WORK_QUEUE_JOURNAL == 'wal' else 'DELETE'}")
+        self.conn.execute("PRAGMA busy_timeout=60000")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                check_name TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                updated_at REAL,
+                UNIQUE (check_name, key)
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (check_name, status, lease_expires)")
+
+    def _write(self, sql: str, params: tuple = ()) -> int:
+        return self.conn.execute(sql, params).rowcount
+
+    # --- Coordinator ---
+    def enqueue(self, check: str, tasks: Iterator[Dict], key_field: Optional[str] = None, batch_size: int = 500) -> int:
+        """
+        Adds tasks keyed by payload[key_field] (the whole payload when not given);
+        re-enqueueing the same repo is a no-op.
+        """
+        added = 0
+        batch: List[tuple] = []
+
+        def flush() -> int:
+            self.conn.execute("BEGIN IMMEDIATE")
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (check_name, key, payload, updated_at) VALUES (?, ?, ?, ?)", batch,
+            )
+            self.conn.execute("COMMIT")
+            return self.conn.total_changes - before
+
+        for payload in tasks:
+            key = str(payload[key_field]) if key_field else json.dumps(payload, sort_keys=True)
+            batch.append((check, key, json.dumps(payload), time.time()))
+            if len(batch) >= batch_size:
+                added += flush()
+                batch = []
+        if batch:
+            added += flush()
+        return added
+
+    def reset(self, check: str) -> None:
+        self._write("DELETE FROM tasks WHERE check_name=?", (check,))
+
+    def counts(self, check: str) -> Dict[str, int]:
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) FROM tasks WHERE check_name=? GROUP BY status", (check,)
+        ).fetchall()
+        return dict(rows)
+
+    def results(self, check: str) -> Iterator[Dict]:
+        for (result,) in self.conn.execute(
+            "SELECT result FROM tasks WHERE check_name=? AND status='done' ORDER BY id", (check,)
+        ):
+            yield json.loads(result)
+
+    def failures(self, check: str) -> List[Tuple[str, str]]:
+        return self.conn.execute(
+            "SELECT key, error FROM tasks WHERE check_name=? AND status='failed' ORDER BY id", (check,)
+        ).fetchall()
+
+    # --- Worker ---
+    def lease(self, check: str, worker: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Task]:
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A task whose worker keeps dying (OOM, hung clone) gives up like one that keeps raising
+            exhausted = self._write(
+                "UPDATE tasks SET status='failed', lease_owner=NULL, updated_at=?, "
+                "error=COALESCE(error, 'lease expired') "
+                "WHERE check_name=? AND status='leased' AND lease_expires < ? AND attempts >= ?",
+                (now, check, now, MAX_ATTEMPTS),
+            )
+            reclaimed = self._write(
+                "UPDATE tasks SET status='pending', lease_owner=NULL "
+                "WHERE check_name=? AND status='leased' AND lease_expires < ?",
+                (check, now),
+            )
+            row = self.conn.execute(
+                "SELECT id, key, payload, attempts FROM tasks WHERE check_name=? AND status='pending' ORDER BY id LIMIT 1",
+                (check,),
+            ).fetchone()
+            if row:
+                self._write(
+                    "UPDATE tasks SET status='leased', lease_owner=?, lease_expires=?, attempts=attempts+1, updated_at=? "
+                    "WHERE id=?",
+                    (worker, now + lease_seconds, now, row[0]),
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if reclaimed:
+            metrics.incr("queue.reclaimed", reclaimed, check=check)
+            logging.warning(f"Reclaimed {reclaimed} expired lease(s) for {check}")
+        if exhausted:
+            metrics.incr("queue.failed", exhausted, check=check)
+            logging.error(f"Gave up on {exhausted} {check} task(s) whose lease expired {MAX_ATTEMPTS} time(s)")
+        if not row:
+            return None
+        metrics.incr("queue.leased", check=check)
+        return Task(row[0], row[1], json.loads(row[2]), row[3] + 1)
+
+    def heartbeat(self, task_id: int, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Extends the lease; False means it expired and was taken over by another worker."""
+        return self._write(
+            "UPDATE tasks SET lease_expires=?, updated_at=? WHERE id=? AND status='leased' AND lease_owner=?",
+            (time.time() + lease_seconds, time.time(), task_id, worker),
+        ) == 1
+
+    def complete(self, task_id: int, worker: str, result: Dict) -> bool:
+        done = self._write(
+            "UPDATE tasks SET status='done', result=?, lease_owner=NULL, updated_at=? "
+            "WHERE id=? AND status='leased' AND lease_owner=?",
+            (json.dumps(result), time.time(), task_id, worker),
+        ) == 1
+        if not done:
+            metrics.incr("queue.lease_lost")
+        return done
+
+    def fail(self, task: Task, worker: str, error: str) -> None:
+        status = "failed" if task.attempts >= MAX_ATTEMPTS else "pending"
+        self._write(
+            "UPDATE tasks SET status=?, error=?, lease_owner=NULL, updated_at=? "
+            "WHERE id=? AND status='leased' AND lease_owner=?",
+            (status, error, time.time(), task.id, worker),
+        )
+
+    def unfinished(self, check: str) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE check_name=? AND status IN ('pending', 'leased')", (check,)
+        ).fetchone()[0]
+
+
+class Heartbeat:
+    """
+    Renews the lease on the worker's current task from one background thread,
+    with one connection of its own for the worker's lifetime.
+    """
+
+    def __init__(self, path: str, worker: str, lease_seconds: float = LEASE_SECONDS) -> None:
+        self.path = path
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self._task_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        queue = WorkQueue(self.path)
+        while not self._stop.wait(self.lease_seconds / 3):
+            task_id = self._task_id
+            if task_id is not None and not queue.heartbeat(task_id, self.worker, self.lease_seconds):
+                logging.warning(f"Lease on task {task_id} lost")
+                if self._task_id == task_id:
+                    self._task_id = None
+        queue.conn.close()
+
+    @contextmanager
+    def track(self, task_id: int) -> Iterator[None]:
+        """Keeps task_id's lease alive for the duration of the block."""
+        self._task_id = task_id
+        try:
+            yield
+        finally:
+            self._task_id = None
+
+    def __enter__(self) -> "Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+# --- Commands ---
+def load_check(check: str):
+    module_name, seed_name, task_name, _ = CHECKS[check]
+    module = importlib.import_module(module_name)
+    return module, getattr(module, seed_name), getattr(module, task_name)
+
+
+def work(check: str, worker: str, path: str = WORK_QUEUE_DB, lease_seconds: float = LEASE_SECONDS) -> int:
+    """Leases and runs tasks until none are pending or leased; returns the number completed."""
+    path = os.path.abspath(path)
+    # Each worker clones in its own scratch dir; shared state keeps absolute paths
+    os.environ.setdefault("SCAN_CACHE_DB", os.path.abspath("scan_cache.sqlite"))
+    scratch = os.path.join(os.path.abspath(WORK_DIR), worker)
+    os.makedirs(scratch, exist_ok=True)
+    os.chdir(scratch)
+
+    _, _, run_task = load_check(check)
+    queue = WorkQueue(path)
+    completed = 0
+    with Heartbeat(path, worker, lease_seconds) as heartbeat:
+        while True:
+            task = queue.lease(check, worker, lease_seconds)
+            if task is None:
+                if not queue.unfinished(check):
+                    break
+                # Everything left is leased by other workers; wait in case a lease expires
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+            start = time.perf_counter()
+            with heartbeat.track(task.id):
+                try:
+                    row = run_task(**task.payload)
+                except Exception as e:
+                    logging.error(f"[{worker}] task {task.key} failed (attempt {task.attempts}): {e}")
+                    metrics.incr("queue.failed", check=check)
+                    queue.fail(task, worker, str(e))
+                    continue
+            if queue.complete(task.id, worker, row):
+                completed += 1
+                metrics.timing("queue.task_duration", (time.perf_counter() - start) * 1000, check=check)
+    logging.info(f"[{worker}] no work left for {check}; completed {completed} task(s)")
+    return completed
+
+
+def spawn_workers(check: str, processes: int, path: str, lease_seconds: float = LEASE_SECONDS) -> List[subprocess.Popen]:
+    host = socket.gethostname()
+    return [
+        subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), "work", check,
+            "--db", os.path.abspath(path), "--worker-id", f"{host}-{os.getpid()}-{i}",
+            "--lease-seconds", str(lease_seconds),
+        ])
+        for i in range(processes)
+    ]
+
+
+def write_report(queue: WorkQueue, check: str, output: Optional[str] = None) -> str:
+    module, _, _ = load_check(check)
+    output = report_path(output or module.OUTPUT_CSV)
+    with ReportWriter(output, module.REPORT_FIELDS) as report:
+        report.write_many(queue.results(check))
+    failures = queue.failures(check)
+    for key, error in failures:
+        print(f"⚠️ {key}: gave up after {MAX_ATTEMPTS} attempt(s): {error}", file=sys.stderr)
+    print(f"✅ {report.rows_written} result(s) written to {output}" + (f"; {len(failures)} failed" if failures else ""))
+    return output
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Run a sweep across many worker processes/hosts")
+    parser.add_argument("command", choices=["enqueue", "work", "status", "report", "run"])
+    parser.add_argument("check", choices=sorted(CHECKS))
+    parser.add_argument("--db", default=WORK_QUEUE_DB)
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start on this host")
+    parser.add_argument("--worker-id", help="defaults to <host>-<pid>")
+    parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS)
+    parser.add_argument("--reset", action="store_true", help="drop this check's existing tasks before enqueueing")
+    parser.add_argument("-o", "--output", help="report path (default: the script's own)")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.db)
+    if args.command in ("enqueue", "run"):
+        if args.reset:
+            queue.reset(args.check)
+        _, seed, _ = load_check(args.check)
+        with metrics.stage("queue_enqueue", check=args.check):
+            added = queue.enqueue(args.check, seed(), key_field=CHECKS[args.check][3])
+        print(f"Enqueued {added} new task(s) for {args.check}")
+
+    if args.command == "work" and args.processes == 1:
+        work(args.check, args.worker_id or f"{socket.gethostname()}-{os.getpid()}", args.db, args.lease_seconds)
+    elif args.command in ("work", "run"):
+        workers = spawn_workers(args.check, args.processes, args.db, args.lease_seconds)
+        for proc in workers:
+            proc.wait()
+
+    if args.command in ("status", "run"):
+        print(json.dumps(queue.counts(args.check), sort_keys=True))
+    if args.command in ("report", "run"):
+        write_report(queue, args.check, args.output)
+
+
+if __name__ == "__main__":
+    metrics.run_main(main)